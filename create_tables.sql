@@ -3,6 +3,7 @@
 -- =====================================================
 
 -- Drop tables if they exist (in correct order due to foreign key constraints)
+DROP TABLE IF EXISTS master_changes;
 DROP TABLE IF EXISTS transactional_data;
 DROP TABLE IF EXISTS product_master;
 DROP TABLE IF EXISTS customer_master;
@@ -48,3 +49,18 @@ CREATE TABLE transactional_data (
     FOREIGN KEY (Customer_ID) REFERENCES customer_master(Customer_ID),
     FOREIGN KEY (Product_ID) REFERENCES product_master(Product_ID)
 );
+
+-- =====================================================
+-- TABLE 4: MASTER DATA CHANGES (live HYBRIDJOIN refresh)
+-- =====================================================
+-- relation: 'customer' or 'product'; op: 'upsert' or 'delete'
+-- payload: record as JSON using HYBRIDJOIN field names, e.g.
+-- {"Customer_ID": 1000001, "Gender": "F", "Age": "0-17", "Occupation": 10,
+--  "City_Category": "A", "Stay_Years": "2", "Marital_Status": 0}
+CREATE TABLE master_changes (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    relation VARCHAR(10) NOT NULL,
+    op VARCHAR(10) NOT NULL,
+    payload JSON NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -17,31 +17,123 @@ Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
 import threading
 import time
 import csv
+import json
+import os
+import pickle
+import struct
 import mysql.connector
 from mysql.connector import Error
-from collections import defaultdict
-from typing import Optional, Dict, List, Any, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from typing import Optional, Dict, List, Any, Tuple, Callable
+import itertools
 import queue
 import sys
+import tempfile
+import base64
+import math
+
+from stream_records import encode_batch, decode_batch, records_to_tuples
+from join_profiler import JoinProfiler
+from stream_aggregates import WindowedAggregates, AGG_TABLE_SQL, AGG_CLEAR_SLIDING_SQL, AGG_UPSERT_SQL
 
 # =====================================================
 # CONFIGURATION CONSTANTS
 # =====================================================
 HASH_TABLE_SLOTS = 10000      # hS - Number of slots in hash table
+HASH_TABLE_MEMORY_BUDGET = None  # Bytes for hash table entries + buckets (None = fixed hS slots)
+HASH_TABLE_LOAD_FACTOR = 0.75 # Target entries per bucket for the resizable table
+HASH_TABLE_MIN_BUCKETS = 1024 # Bucket array never shrinks below this
+HASH_BUCKET_BYTES = 64        # Approx. bytes per bucket (pointer + empty list)
+HASH_ENTRY_OVERHEAD_BYTES = 200  # Approx. bytes per entry besides the tuple dict (queue node, slot tuple)
+HASH_ENTRY_ESTIMATE_BYTES = 700  # Entry size assumed before any entry was measured
+MEMORY_BUDGET = None          # Bytes for all join components together (None = account only)
+QUEUE_NODE_BYTES = 160        # Approx. bytes per queue node (tuple data counted by the hash table)
 DISK_PARTITION_SIZE = 500     # vP - Size of each disk partition
 STREAM_BATCH_SIZE = 100       # Tuples to read from CSV at a time
 STREAM_DELAY = 0.01           # Delay between stream batches (simulates real-time)
+MASTER_PAGE_SIZE = DISK_PARTITION_SIZE  # Keys per copy-on-write master data page
+MASTER_REFRESH_INTERVAL = 5.0 # Seconds between master data change polls
+PARTITION_POLICY = 'benefit'  # 'benefit' (most waiting matches per load) or 'oldest' (classic)
+MAX_TUPLE_WAIT = 2.0          # Seconds before the oldest tuple's partition is forced (benefit policy)
+MASTER_FETCH_SIZE = 5000      # Rows per fetchmany when loading master data from MySQL
+SOURCE_PAGE_ROWS = 50000      # Rows per keyset page when streaming from the transactional_data table
+SOURCE_FETCH_SIZE = 5000      # Rows per fetchmany within a keyset page
+SOURCE_POLL_INTERVAL = 0.5    # Seconds between polls for new rows once the table is caught up
+TAIL_POLL_MIN = 0.001         # First poll delay when a followed file has no new data (doubles up to max)
+TAIL_POLL_MAX = 0.1           # Longest poll delay when following a file
+COMMIT_MAX_ROWS = 5000        # Upper bound on DW rows per commit (adaptive row target starts here)
+COMMIT_MIN_ROWS = 100         # Lower bound the adaptive row target can shrink to
+COMMIT_MAX_BYTES = 4 * 1024 * 1024  # DW bytes per commit before a commit is forced
+COMMIT_MAX_AGE = 1.0          # Seconds the oldest uncommitted row may wait
+COMMIT_TARGET_LATENCY = 0.05  # Commit duration (seconds) the row target is tuned towards
+COMMIT_HISTORY = 1000         # Recent commits kept for the rows/latency percentiles
+LATENCY_TARGET = None         # Seconds of end-to-end delay (stream arrival -> DW commit) p99 is held under (None = throughput mode)
+SLO_WAIT_SHARE = 0.5          # Share of the latency target allowed for waiting in the join window
+SLO_COMMIT_SHARE = 0.25       # Share of the latency target allowed for waiting on a commit
+SLO_TIGHTEN_AT = 0.8          # Tighten the knobs when a commit's p99 delay exceeds this share of the target
+SLO_RELAX_AT = 0.4            # Relax them again when it falls below this share
+SLO_MIN_LEVEL = 0.02          # Knobs are never scaled below this share of their SLO baseline
+SLO_WINDOW_ROWS = 50000       # Recent committed rows the reported delay percentiles cover
+KEY_BITMAP_MAX_SPAN = 256     # Bitmap key filter only while key range <= this many bits per key (else a set)
+DEDUP_ENABLED = False         # Drop repeated order_ids before they enter the join (opt-in: ~12 MB, costs per tuple)
+DEDUP_WINDOW = 100000         # Most recent order_ids remembered exactly
+DEDUP_FILTER_CAPACITY = 5000000  # order_ids per Bloom filter generation (two generations kept)
+DEDUP_FP_RATE = 0.0001        # Target Bloom filter false-positive rate at capacity
+DEDUP_SAMPLE_RATE = 64        # 1 in N order_ids is also tracked exactly to measure the false-positive rate
+PRODUCT_RETRY_LIMIT = 50000   # Tuples with an unknown product held for a re-probe after the next master refresh
+CHECKPOINT_VERSION = 2        # Bumped whenever the checkpoint layout changes
+SNAPSHOT_VERSION = 1          # Bumped whenever the master data snapshot layout changes
+SNAPSHOT_MAGIC = b'HJSNAP'    # File signature of master data snapshots
+
+DW_SINK_MODE = 'insert'       # 'insert' (INSERT statements) or 'bulk' (LOAD DATA LOCAL INFILE)
+BULK_SEGMENT_ROWS = 50000     # Rows per TSV segment before it is bulk-loaded
+INSERT_BATCH_SIZE = 1000      # Rows per executemany when bulk loading falls back to INSERTs
+
+DW_INDEX_MODE = 'immediate'   # 'immediate' (maintain per insert), 'deferred' (build after loading into an empty table) or 'none'
+
+# Secondary indexes analysts need on DW_ENRICHED_TRANSACTIONS (name -> column)
+DW_SECONDARY_INDEXES = {
+    'idx_dw_order_date': 'order_date',
+    'idx_dw_customer_id': 'customer_id',
+    'idx_dw_product_id': 'product_id',
+    'idx_dw_store_id': 'store_id'
+}
+
+# Columns of DW_ENRICHED_TRANSACTIONS filled by the join (insert order)
+DW_COLUMNS = [
+    'order_id', 'order_date', 'quantity', 'customer_id', 'gender', 'age', 'occupation',
+    'city_category', 'stay_years', 'marital_status', 'product_id', 'product_category',
+    'price', 'store_id', 'supplier_id', 'store_name', 'supplier_name', 'total_amount'
+]
+DW_INSERT_SQL = (
+    f"INSERT INTO DW_ENRICHED_TRANSACTIONS ({', '.join(DW_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(DW_COLUMNS))})"
+)
 
 
 # =====================================================
 # DATA STRUCTURES
 # =====================================================
 
+def approx_tuple_bytes(data: Dict) -> int:
+    """Approximate bytes of a stream tuple dict and its values"""
+    return sys.getsizeof(data) + sum(sys.getsizeof(v) for v in data.values())
+
+
+def dw_row_bytes(values: Tuple) -> int:
+    """Approximate bytes a DW row adds to a transaction (strings by length, numbers 8)"""
+    return sum(len(v) if isinstance(v, str) else 8 for v in values)
+
+
 class QueueNode:
     """Node for doubly-linked list queue"""
     def __init__(self, key: Any, data: Dict):
         self.key = key              # Join attribute value (e.g., Customer_ID)
         self.data = data            # Full tuple data
+        self.enqueued_at = time.time()  # Admission time (for wait-time bounds)
         self.prev: Optional['QueueNode'] = None
         self.next: Optional['QueueNode'] = None
 
@@ -104,37 +196,105 @@ class DoublyLinkedQueue:
         with self.lock:
             return self.head.key if self.head else None
     
+    def peek_oldest(self) -> Optional[QueueNode]:
+        """Return the oldest node without removing"""
+        with self.lock:
+            return self.head
+    
+    def peek_oldest_age(self) -> float:
+        """Seconds the oldest node has been waiting (0 if empty)"""
+        with self.lock:
+            return time.time() - self.head.enqueued_at if self.head else 0.0
+    
     def is_empty(self) -> bool:
         return self.size == 0
     
+    def approx_bytes(self) -> int:
+        """Approximate bytes of the queue nodes (tuple data is shared with the hash table)"""
+        return self.size * QUEUE_NODE_BYTES
+    
+    def snapshot(self) -> List[Dict]:
+        """Return tuple data of all nodes in FIFO order"""
+        with self.lock:
+            items = []
+            node = self.head
+            while node:
+                items.append(node.data)
+                node = node.next
+            return items
+    
     def __len__(self) -> int:
         return self.size
 
 
 class HashTable:
     """
-    Multi-map hash table with fixed number of slots.
+    Multi-map hash table with a resizable bucket array.
     Each slot can hold multiple entries (for handling collisions and duplicates).
+
+    The bucket array grows and shrinks to keep entries/buckets near
+    HASH_TABLE_LOAD_FACTOR. Admission is limited either by a fixed entry
+    count (max_entries, the classic hS) or, when memory_budget is given, by
+    the approximate bytes held by entries and buckets.
     """
-    def __init__(self, num_slots: int = HASH_TABLE_SLOTS):
-        self.num_slots = num_slots
-        self.slots: List[List[Tuple[Any, Dict, QueueNode]]] = [[] for _ in range(num_slots)]
+    def __init__(self, num_slots: int = HASH_TABLE_SLOTS, memory_budget: Optional[int] = None,
+                 load_factor: float = HASH_TABLE_LOAD_FACTOR):
+        self.max_entries = num_slots
+        self.memory_budget = memory_budget
+        self.load_factor = load_factor
+        self.num_slots = HASH_TABLE_MIN_BUCKETS if memory_budget else num_slots
+        self.slots: List[List[Tuple[Any, Dict, QueueNode]]] = [[] for _ in range(self.num_slots)]
         self.total_entries = 0
+        self.entry_bytes = 0     # Approximate bytes held by stored entries
+        self.resizes = 0
         self.lock = threading.Lock()
     
     def _hash(self, key: Any) -> int:
         """Hash function to map key to slot"""
         return hash(key) % self.num_slots
     
+    @staticmethod
+    def entry_size(data: Dict) -> int:
+        """Approximate bytes of one entry: tuple dict, its values, queue node and slot tuple"""
+        return approx_tuple_bytes(data) + HASH_ENTRY_OVERHEAD_BYTES
+    
+    def bucket_bytes(self) -> int:
+        """Approximate bytes of the bucket array itself"""
+        return self.num_slots * HASH_BUCKET_BYTES
+    
+    def memory_used(self) -> int:
+        return self.entry_bytes + self.bucket_bytes()
+    
+    def _resize(self, num_slots: int):
+        """Rehash all entries into a bucket array of the given size"""
+        old_slots = self.slots
+        self.num_slots = num_slots
+        self.slots = [[] for _ in range(num_slots)]
+        for slot in old_slots:
+            for entry in slot:
+                self.slots[hash(entry[0]) % num_slots].append(entry)
+        self.resizes += 1
+    
+    def _maybe_resize(self):
+        if not self.memory_budget:
+            return  # Fixed-size table (classic hS slots)
+        load = self.total_entries / self.num_slots
+        if load > self.load_factor:
+            self._resize(self.num_slots * 2)
+        elif load < self.load_factor / 4 and self.num_slots > HASH_TABLE_MIN_BUCKETS:
+            self._resize(max(self.num_slots // 2, HASH_TABLE_MIN_BUCKETS))
+    
     def insert(self, key: Any, data: Dict, queue_node: QueueNode) -> bool:
         """Insert tuple into hash table"""
         with self.lock:
-            if self.total_entries >= self.num_slots:
+            if not self.memory_budget and self.total_entries >= self.max_entries:
                 return False  # Hash table full
             
             slot_idx = self._hash(key)
             self.slots[slot_idx].append((key, data, queue_node))
             self.total_entries += 1
+            self.entry_bytes += self.entry_size(data)
+            self._maybe_resize()
             return True
     
     def lookup(self, key: Any) -> List[Tuple[Dict, QueueNode]]:
@@ -155,27 +315,203 @@ class HashTable:
                 if k == key and qn is queue_node:
                     del self.slots[slot_idx][i]
                     self.total_entries -= 1
+                    self.entry_bytes -= self.entry_size(data)
+                    self._maybe_resize()
                     return True
             return False
     
     def available_slots(self) -> int:
-        """Return number of free slots"""
-        return self.num_slots - self.total_entries
+        """
+        Return number of tuples that can still be admitted.
+        Under a memory budget this is the free budget divided by the
+        average entry size seen so far.
+        """
+        if not self.memory_budget:
+            return self.max_entries - self.total_entries
+        with self.lock:
+            avg_entry = self.entry_bytes / self.total_entries if self.total_entries else HASH_ENTRY_ESTIMATE_BYTES
+            # Try the current bucket array and each doubling of it: entries
+            # must fit under the load factor and, with the buckets, in the budget
+            best = 0
+            buckets = self.num_slots
+            while buckets * HASH_BUCKET_BYTES <= self.memory_budget:
+                fits_memory = (self.memory_budget - self.entry_bytes - buckets * HASH_BUCKET_BYTES) // avg_entry
+                fits_load = int(buckets * self.load_factor) - self.total_entries
+                best = max(best, int(min(fits_memory, fits_load)))
+                if fits_memory <= fits_load:
+                    break  # Larger bucket arrays only leave less memory
+                buckets *= 2
+            return best
     
     def is_empty(self) -> bool:
         return self.total_entries == 0
 
 
+class PartitionHistogram:
+    """
+    Number of waiting stream tuples per master data partition (page).
+    Used to pick the partition whose load will match the most tuples.
+
+    Tuples still counted for a page right after that page was loaded have
+    no matching master record; they are tracked as unmatchable so the page
+    is not chosen again for them (until master data changes).
+    Only the join consumer thread updates it.
+    """
+    def __init__(self):
+        self.waiting: Dict[int, int] = defaultdict(int)
+        self.unmatchable: Dict[int, int] = {}
+    
+    def add(self, page: int):
+        self.waiting[page] += 1
+    
+    def remove(self, page: int):
+        self.waiting[page] -= 1
+        if self.waiting[page] <= 0:
+            del self.waiting[page]
+            self.unmatchable.pop(page, None)
+    
+    def mark_loaded(self, page: int):
+        """Remember tuples left behind after a full page load"""
+        if page in self.waiting:
+            self.unmatchable[page] = self.waiting[page]
+    
+    def reset_unmatchable(self):
+        """Master data changed: left-behind tuples may match now"""
+        self.unmatchable.clear()
+    
+    def benefit(self, page: int) -> int:
+        return self.waiting.get(page, 0) - self.unmatchable.get(page, 0)
+    
+    def best_page(self) -> Optional[int]:
+        """Page with the most matchable waiting tuples, or None"""
+        best, best_benefit = None, 0
+        for page, count in self.waiting.items():
+            benefit = count - self.unmatchable.get(page, 0)
+            if benefit > best_benefit:
+                best, best_benefit = page, benefit
+        return best
+
+
+class DuplicateFilter:
+    """
+    Detects repeated order_ids (upstream replays and retries) at ingest.
+
+    The last DEDUP_WINDOW order_ids are kept in an exact set. Older repeats
+    are caught by a Bloom filter; it has two generations of
+    DEDUP_FILTER_CAPACITY keys each, so its memory is bounded and the
+    oldest keys age out. A Bloom hit outside the window may be a false
+    positive. To measure the actual rate, 1 in DEDUP_SAMPLE_RATE order_ids
+    (chosen by hash) is also tracked exactly.
+    """
+    def __init__(self, window: int = DEDUP_WINDOW, capacity: int = DEDUP_FILTER_CAPACITY,
+                 fp_rate: float = DEDUP_FP_RATE):
+        self.window = window
+        self.recent = set()
+        self.recent_order = deque()
+        self.capacity = capacity
+        self.num_bits = max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.current = bytearray(self.num_bits // 8 + 1)
+        self.previous: Optional[bytearray] = None
+        self.current_count = 0
+        self.previous_count = 0
+        self.sample_current = set()
+        self.sample_previous = set()
+        self.suppressed_window = 0
+        self.suppressed_filter = 0
+        self.sample_fresh = 0            # Sampled order_ids seen for the first time
+        self.sample_false_positives = 0  # ... that the Bloom filter still reported as seen
+    
+    @staticmethod
+    def _mix(key: int) -> int:
+        """splitmix64 finalizer: spreads consecutive order_ids over the filter"""
+        x = (key + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        return x ^ (x >> 31)
+    
+    def _positions(self, mixed: int) -> List[int]:
+        h1, h2 = mixed >> 32, (mixed & 0xFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+    
+    @staticmethod
+    def _contains(bits: bytearray, positions: List[int]) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+    
+    def is_duplicate(self, order_id: int) -> bool:
+        """True if the order_id was seen before; otherwise remember it"""
+        if order_id in self.recent:
+            self.suppressed_window += 1
+            return True
+        
+        mixed = self._mix(order_id)
+        positions = self._positions(mixed)
+        hit = self._contains(self.current, positions) or \
+            (self.previous is not None and self._contains(self.previous, positions))
+        
+        if (mixed >> 8) % DEDUP_SAMPLE_RATE == 0:
+            if order_id not in self.sample_current and order_id not in self.sample_previous:
+                self.sample_fresh += 1
+                self.sample_false_positives += hit
+            self.sample_current.add(order_id)
+        
+        if hit:
+            self.suppressed_filter += 1
+            return True
+        
+        self.recent.add(order_id)
+        self.recent_order.append(order_id)
+        if len(self.recent_order) > self.window:
+            self.recent.discard(self.recent_order.popleft())
+        for p in positions:
+            self.current[p >> 3] |= 1 << (p & 7)
+        self.current_count += 1
+        if self.current_count >= self.capacity:
+            # Start a new generation; the oldest keys are forgotten
+            self.previous, self.previous_count = self.current, self.current_count
+            self.current, self.current_count = bytearray(len(self.current)), 0
+            self.sample_previous, self.sample_current = self.sample_current, set()
+        return False
+    
+    @property
+    def suppressed(self) -> int:
+        return self.suppressed_window + self.suppressed_filter
+    
+    def measured_fp_rate(self) -> Optional[float]:
+        return self.sample_false_positives / self.sample_fresh if self.sample_fresh else None
+    
+    def expected_fp_rate(self) -> float:
+        """False-positive probability of the two generations at their current fill"""
+        miss = 1.0
+        for count in (self.current_count, self.previous_count):
+            miss *= 1.0 - (1.0 - math.exp(-self.num_hashes * count / self.num_bits)) ** self.num_hashes
+        return 1.0 - miss
+    
+    def approx_bytes(self) -> int:
+        filters = len(self.current) + (len(self.previous) if self.previous is not None else 0)
+        exact = (len(self.recent) + len(self.sample_current) + len(self.sample_previous)) * 100
+        return filters + exact
+
+
 class StreamBuffer:
     """Thread-safe buffer for incoming stream tuples"""
     def __init__(self, max_size: int = 50000):
         self.buffer = queue.Queue(maxsize=max_size)
         self.finished = False
+        self.tuple_bytes = 0      # Sampled size of one buffered tuple
+        self.puts = 0
     
     def put(self, tuple_data: Dict):
         """Add tuple to buffer"""
+        if self.puts % 1000 == 0:
+            self.tuple_bytes = approx_tuple_bytes(tuple_data)
+        self.puts += 1
         self.buffer.put(tuple_data)
     
+    def approx_bytes(self) -> int:
+        """Approximate bytes of the buffered tuples"""
+        return self.buffer.qsize() * self.tuple_bytes
+    
     def get(self, timeout: float = 1.0) -> Optional[Dict]:
         """Get tuple from buffer"""
         try:
@@ -204,6 +540,683 @@ class StreamBuffer:
         return self.finished and self.buffer.empty()
 
 
+class MemoryManager:
+    """
+    Approximate memory accounting across the join components.
+
+    Each component registers a callable returning its current bytes.
+    With a budget, the producer is throttled while the total is over
+    budget and the consumer's admission into the hash table is limited to
+    the remaining room, so the stream buffer and join window shrink back.
+    Without a budget it only records usage for the statistics.
+    """
+    def __init__(self, budget: Optional[int] = MEMORY_BUDGET):
+        self.budget = budget
+        self.components: Dict[str, Any] = {}
+        self.peak: Dict[str, int] = defaultdict(int)
+        self.peak_total = 0
+        self.throttle_count = 0
+        self.throttle_time = 0.0
+        self.admission_limited = 0   # Consumer iterations whose admission was cut by the budget
+    
+    def register(self, name: str, estimator):
+        self.components[name] = estimator
+    
+    def usage(self) -> Dict[str, int]:
+        """Current approximate bytes per component (also updates peaks)"""
+        usage = {name: int(estimator()) for name, estimator in self.components.items()}
+        for name, used in usage.items():
+            if used > self.peak[name]:
+                self.peak[name] = used
+        self.peak_total = max(self.peak_total, sum(usage.values()))
+        return usage
+    
+    def total(self) -> int:
+        return sum(self.usage().values())
+    
+    def free(self) -> Optional[int]:
+        """Bytes left under the budget (None without a budget)"""
+        if not self.budget:
+            self.usage()
+            return None
+        return self.budget - self.total()
+    
+    def throttle_producer(self, can_drain, keep_waiting):
+        """
+        Block the producer while over budget and the consumer can still
+        drain buffered tuples (can_drain) and the run is active (keep_waiting).
+        """
+        if not self.budget or self.free() > 0:
+            return
+        start = time.time()
+        self.throttle_count += 1
+        while keep_waiting() and can_drain() and self.free() <= 0:
+            time.sleep(0.01)
+        self.throttle_time += time.time() - start
+    
+    def admission_allowance(self, tuple_bytes: int, minimum: int) -> Optional[int]:
+        """
+        Number of stream tuples the consumer may admit now
+        (None = no limit; never below 'minimum' so the join keeps moving)
+        """
+        free = self.free()
+        if free is None:
+            return None
+        return max(minimum, int(free // max(tuple_bytes, 1)))
+
+
+class CommitPolicy:
+    """
+    Group-commit policy for the DW writer.
+
+    A commit is due once the open transaction holds 'row_target' rows,
+    COMMIT_MAX_BYTES bytes, or its oldest row is COMMIT_MAX_AGE seconds old.
+    The row target adapts to observed commit latency: it is halved when a
+    commit takes longer than the target latency and grown by a quarter when
+    commits finish in under half of it.
+    Per-commit rows and latencies are kept for the last COMMIT_HISTORY
+    commits only; counts, totals and maxima cover the whole run.
+    
+    With segment_rows set (bulk sink), rows are committed once per bulk
+    segment instead: the row and byte triggers give way to the segment size,
+    so the row target does not cap segments. The age bound still applies.
+    """
+    def __init__(self, max_rows: int = COMMIT_MAX_ROWS, min_rows: int = COMMIT_MIN_ROWS,
+                 max_bytes: int = COMMIT_MAX_BYTES, max_age: float = COMMIT_MAX_AGE,
+                 target_latency: float = COMMIT_TARGET_LATENCY, history: int = COMMIT_HISTORY):
+        self.max_rows = max_rows
+        self.min_rows = min(min_rows, max_rows)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.target_latency = target_latency
+        self.row_target = max_rows
+        self.segment_rows: Optional[int] = None  # Set by the bulk sink
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        self.opened_at: Optional[float] = None
+        self.rows_per_commit = deque(maxlen=history)   # Recent commits only
+        self.commit_times = deque(maxlen=history)
+        self.commits = 0
+        self.commit_seconds = 0.0     # Total time spent committing
+        self.max_commit_rows = 0
+        self.max_commit_time = 0.0
+        self.reasons: Dict[str, int] = defaultdict(int)
+    
+    def record(self, rows: int, nbytes: int):
+        """Account rows written into the open transaction"""
+        if rows and self.opened_at is None:
+            self.opened_at = time.time()
+        self.pending_rows += rows
+        self.pending_bytes += nbytes
+    
+    def due(self) -> Optional[str]:
+        """Reason the open transaction should be committed now, or None"""
+        if not self.pending_rows:
+            return None
+        if self.segment_rows:
+            if self.pending_rows >= self.segment_rows:
+                return 'segment'
+        elif self.pending_rows >= self.row_target:
+            return 'rows'
+        elif self.pending_bytes >= self.max_bytes:
+            return 'bytes'
+        if time.time() - self.opened_at >= self.max_age:
+            return 'age'
+        return None
+    
+    def committed(self, elapsed: float, reason: str = 'final'):
+        """Record a finished commit and adapt the row target to its latency"""
+        if self.pending_rows:
+            self.rows_per_commit.append(self.pending_rows)
+            self.commit_times.append(elapsed)
+            self.commits += 1
+            self.commit_seconds += elapsed
+            self.max_commit_rows = max(self.max_commit_rows, self.pending_rows)
+            self.max_commit_time = max(self.max_commit_time, elapsed)
+            self.reasons[reason] += 1
+            if self.segment_rows:
+                pass  # Bulk commits are sized by the segment, not the row target
+            elif elapsed > self.target_latency:
+                self.row_target = max(self.min_rows, self.row_target // 2)
+            elif elapsed < self.target_latency / 2 and self.pending_rows >= self.row_target // 2:
+                self.row_target = min(self.max_rows, self.row_target + max(self.row_target // 4, 1))
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        self.opened_at = None
+    
+    @staticmethod
+    def percentiles(values) -> Tuple[float, float, float]:
+        """(p50, p95, max) of a list of observations"""
+        if not values:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(values)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return pick(0.50), pick(0.95), ordered[-1]
+
+
+class LatencySLO:
+    """
+    End-to-end delay target for the latency mode.
+
+    Delay is measured per row from stream arrival to the DW commit that makes
+    it visible. After every commit the p99 delay of the committed rows moves
+    a knob level in (0, 1]: halved when it exceeds SLO_TIGHTEN_AT of the
+    target, grown by a quarter below SLO_RELAX_AT. The join scales its
+    latency knobs (partition age bound, commit age, rows per commit, batch
+    sizes) by this level.
+    """
+    def __init__(self, target: float, window: int = SLO_WINDOW_ROWS):
+        self.target = target
+        self.level = 1.0
+        self.pending: List[float] = []           # Arrival times of rows in the open transaction
+        self.recent = deque(maxlen=window)       # Delays of recently committed rows
+        self.rows = 0
+        self.violations = 0
+        self.max_delay = 0.0
+        self.last_p99 = 0.0
+        self.adjustments = 0
+    
+    def record(self, arrived: Optional[float]):
+        if arrived is not None:
+            self.pending.append(arrived)
+    
+    def committed(self, now: float) -> bool:
+        """Account the rows of a finished commit; True when the knob level changed"""
+        if not self.pending:
+            return False
+        delays = sorted(now - arrived for arrived in self.pending)
+        self.pending = []
+        self.recent.extend(delays)
+        self.rows += len(delays)
+        self.violations += len(delays) - bisect_right(delays, self.target)
+        self.max_delay = max(self.max_delay, delays[-1])
+        
+        p99 = self.last_p99 = delays[min(len(delays) - 1, int(0.99 * len(delays)))]
+        level = self.level
+        if p99 > self.target * SLO_TIGHTEN_AT:
+            level = max(SLO_MIN_LEVEL, level / 2)
+        elif p99 < self.target * SLO_RELAX_AT:
+            level = min(1.0, level * 1.25)
+        if level == self.level:
+            return False
+        self.level = level
+        self.adjustments += 1
+        return True
+    
+    def percentiles(self) -> Tuple[float, float, float]:
+        """(p50, p99, max) delay over the recent window"""
+        if not self.recent:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self.recent)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return pick(0.50), pick(0.99), ordered[-1]
+
+
+class DeadLetterSink:
+    """
+    Destination for stream tuples the join cannot use.
+    Every tuple is counted per reason and, with a path, appended to a
+    JSON-lines file as {"reason", "at", "tuple"} so it can be inspected
+    or replayed later.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = defaultdict(int)
+    
+    def write(self, tuple_data: Dict, reason: str):
+        with self.lock:
+            self.counts[reason] += 1
+            if not self.path:
+                return
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(json.dumps({'reason': reason, 'at': time.time(), 'tuple': tuple_data}) + '\n')
+    
+    def total(self) -> int:
+        return sum(self.counts.values())
+    
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+class ProductRetryBuffer:
+    """
+    Tuples whose product was missing from the master data they were joined
+    against. Each waits for the next master refresh poll (a refresh may add
+    the product) and is then re-probed once; what still fails is dead-lettered.
+    """
+    def __init__(self, limit: int = PRODUCT_RETRY_LIMIT):
+        self.limit = limit
+        self.pending = deque()   # (refresh poll at deferral, tuple), oldest first
+        self.lock = threading.Lock()
+        self.deferred = 0
+        self.recovered = 0
+    
+    def add(self, tuple_data: Dict, poll: int) -> bool:
+        """Defer a tuple until refresh poll 'poll' has passed (False when the buffer is full)"""
+        with self.lock:
+            if len(self.pending) >= self.limit:
+                return False
+            self.pending.append((poll, tuple_data))
+            self.deferred += 1
+            return True
+    
+    def ready(self, poll: int) -> bool:
+        pending = self.pending
+        return bool(pending) and pending[0][0] < poll
+    
+    def take(self, poll: Optional[int] = None) -> List[Dict]:
+        """Remove the tuples deferred before refresh poll 'poll' (all of them for None)"""
+        with self.lock:
+            tuples = []
+            while self.pending and (poll is None or self.pending[0][0] < poll):
+                tuples.append(self.pending.popleft()[1])
+            return tuples
+    
+    def snapshot(self) -> List[Dict]:
+        with self.lock:
+            return [tuple_data for _, tuple_data in self.pending]
+    
+    def approx_bytes(self) -> int:
+        with self.lock:
+            pending = self.pending
+            return sys.getsizeof(pending) + len(pending) * (approx_tuple_bytes(pending[0][1]) if pending else 0)
+    
+    def __len__(self) -> int:
+        return len(self.pending)
+
+
+class CheckpointManager:
+    """
+    Persists HYBRIDJOIN progress so a crashed run can resume.
+
+    A checkpoint is taken right after a DW commit and records:
+    - the stream source (see HybridJoin.describe_source); a checkpoint is
+      only resumed by a run over the same source
+    - the producer offset just past the last tuple admitted to the queue
+      (file byte offset, [file name, offset] for a directory, or last
+      orderID for a table source; none for a producer that cannot replay)
+    - the in-flight queue contents (admitted but not yet joined)
+    - the last committed DW batch (commit sequence number and row counts)
+
+    Tuples still sitting in the stream buffer are not saved; they lie after
+    the recorded offset and are simply re-read on resume.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self, state: Dict):
+        """Write checkpoint atomically (temp file + rename)"""
+        state = dict(state, version=CHECKPOINT_VERSION, saved_at=time.time())
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> Optional[Dict]:
+        """Return the saved state, or None if missing or incompatible"""
+        if not self.exists():
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Checkpoint] Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if state.get('version') != CHECKPOINT_VERSION:
+            print(f"[Checkpoint] Ignoring checkpoint with version {state.get('version')}")
+            return None
+        return state
+
+    def clear(self):
+        """Remove checkpoint after a run completes"""
+        if self.exists():
+            os.remove(self.path)
+
+
+# =====================================================
+# COLUMNAR STORAGE (compact master data representation)
+# =====================================================
+
+# Column types: array typecodes for numeric fields, 'dict' for
+# dictionary-encoded low-cardinality strings, 'str' for plain strings
+CUSTOMER_SCHEMA = {
+    'Customer_ID': 'q',
+    'Gender': 'dict',
+    'Age': 'dict',
+    'Occupation': 'i',
+    'City_Category': 'dict',
+    'Stay_Years': 'dict',
+    'Marital_Status': 'b'
+}
+PRODUCT_SCHEMA = {
+    'Product_ID': 'str',
+    'Product_Category': 'dict',
+    'Price': 'd',
+    'Store_ID': 'i',
+    'Supplier_ID': 'i',
+    'Store_Name': 'dict',
+    'Supplier_Name': 'dict'
+}
+
+
+class DictionaryColumn:
+    """
+    Dictionary-encoded string column.
+    Each distinct value is stored once; rows hold a small integer code.
+    """
+    def __init__(self):
+        self.values: List[str] = []
+        self.value_codes: Dict[str, int] = {}
+        self.codes = array('H')
+    
+    def encode(self, value: str) -> int:
+        code = self.value_codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.value_codes[value] = code
+            if code > 0xFFFF and self.codes.typecode == 'H':
+                self.codes = array('I', self.codes)  # Widen codes past 65,535 values
+        return code
+    
+    def append(self, value: str):
+        self.codes.append(self.encode(value))
+    
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+    
+    def __setitem__(self, row: int, value: str):
+        self.codes[row] = self.encode(value)
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class ColumnarTable(Mapping):
+    """
+    Column-oriented store for one master relation.
+
+    Numeric fields live in typed arrays, low-cardinality strings are
+    dictionary-encoded, and a key-to-row index gives O(1)/O(log n) lookup.
+    For integer keys the rows are kept sorted by key, so the key column
+    itself is the index (binary search) and doubles as the sorted key
+    order needed for partition loading.
+
+    Behaves as a read-only mapping of key -> record dict, so it can stand in
+    for the plain dict-of-dicts representation.
+    """
+    def __init__(self, key_field: str, schema: Dict[str, str]):
+        self.key_field = key_field
+        self.schema = schema
+        self.columns: Dict[str, Any] = {}
+        for field, kind in schema.items():
+            if kind == 'dict':
+                self.columns[field] = DictionaryColumn()
+            elif kind == 'str':
+                self.columns[field] = []
+            else:
+                self.columns[field] = array(kind)
+        self.sorted_keys = schema[key_field] not in ('dict', 'str')
+        self.key_index: Dict[Any, int] = {}  # Only used for non-integer keys
+    
+    def append(self, record: Dict):
+        """Add a record (call finalize() once all records are appended)"""
+        if not self.sorted_keys:
+            self.key_index[record[self.key_field]] = len(self)
+        for field, column in self.columns.items():
+            column.append(record[field])
+    
+    def finalize(self):
+        """Sort rows by key when the key column doubles as the index"""
+        if not self.sorted_keys:
+            return
+        keys = self.columns[self.key_field]
+        if all(keys[i] < keys[i + 1] for i in range(len(keys) - 1)):
+            return
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        for field, column in self.columns.items():
+            if isinstance(column, DictionaryColumn):
+                column.codes = array(column.codes.typecode, (column.codes[i] for i in order))
+            else:
+                self.columns[field] = type(column)(column.typecode, (column[i] for i in order))
+    
+    def row_of(self, key: Any) -> Optional[int]:
+        """Return the row index of a key, or None"""
+        if not self.sorted_keys:
+            return self.key_index.get(key)
+        keys = self.columns[self.key_field]
+        row = bisect_left(keys, key)
+        if row < len(keys) and keys[row] == key:
+            return row
+        return None
+    
+    def record(self, row: int) -> Dict:
+        """Materialize one row as a record dict"""
+        return {field: column[row] for field, column in self.columns.items()}
+    
+    def approx_bytes(self) -> int:
+        """Approximate bytes of all columns and the key index"""
+        total = sys.getsizeof(self.key_index)
+        for column in self.columns.values():
+            if isinstance(column, DictionaryColumn):
+                total += column.codes.buffer_info()[1] * column.codes.itemsize
+                total += sum(sys.getsizeof(v) for v in column.values) + sys.getsizeof(column.value_codes)
+            elif isinstance(column, array):
+                total += column.buffer_info()[1] * column.itemsize
+            else:
+                total += sys.getsizeof(column) + sum(sys.getsizeof(v) for v in column)
+        return total
+    
+    def keys_sorted(self):
+        """Keys in ascending order"""
+        if self.sorted_keys:
+            return self.columns[self.key_field]
+        return sorted(self.key_index)
+    
+    def __getitem__(self, key: Any) -> Dict:
+        row = self.row_of(key)
+        if row is None:
+            raise KeyError(key)
+        return self.record(row)
+    
+    def __contains__(self, key: Any) -> bool:
+        return self.row_of(key) is not None
+    
+    def __iter__(self):
+        return iter(self.columns[self.key_field])
+    
+    def __len__(self) -> int:
+        return len(self.columns[self.key_field])
+
+
+# =====================================================
+# MASTER DATA VERSIONS (live incremental refresh)
+# =====================================================
+
+class KeyBitmap:
+    """
+    Compact, exact existence filter for integer keys: one bit per value
+    between the smallest and largest key (customer IDs are dense, so about
+    one byte per 8 customers). Falls back to a set for sparse key ranges.
+    """
+    def __init__(self, keys):
+        keys = list(keys)
+        self.low = min(keys) if keys else 0
+        self.span = max(keys) - self.low + 1 if keys else 0
+        self.keys = None
+        self.bits = None
+        if self.span <= KEY_BITMAP_MAX_SPAN * max(len(keys), 1):
+            self.bits = bytearray(self.span // 8 + 1)
+            for key in keys:
+                offset = key - self.low
+                self.bits[offset >> 3] |= 1 << (offset & 7)
+        else:
+            self.keys = set(keys)
+    
+    def __contains__(self, key: int) -> bool:
+        if self.bits is None:
+            return key in self.keys
+        offset = key - self.low
+        return 0 <= offset < self.span and bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+    
+    def approx_bytes(self) -> int:
+        return len(self.bits) if self.bits is not None else sys.getsizeof(self.keys)
+
+
+class PageDelta:
+    """
+    Changes applied to one customer partition page.
+    Immutable once built: a refresh creates a new PageDelta for every page
+    it touches and shares all others with the previous version.
+    """
+    __slots__ = ('upserts', 'deleted', 'keys')
+    
+    def __init__(self, base_keys, upserts: Dict[int, Dict], deleted: set):
+        self.upserts = upserts
+        self.deleted = deleted
+        # Effective sorted keys of the page after applying the changes
+        self.keys = sorted((set(base_keys) - deleted) | upserts.keys())
+
+
+class MasterDataVersion:
+    """
+    Immutable, consistent view of master data at one refresh version.
+
+    The loaded relations are the shared base. Customer changes are kept as
+    copy-on-write PageDelta objects per partition page (pages follow the
+    sorted base keys, MASTER_PAGE_SIZE keys each); product changes as a
+    copy-on-write overlay dict. Applying a change set copies only the page
+    directory and the touched pages, so refresh cost follows the delta,
+    while a probe holding an older version keeps seeing that version.
+    """
+    def __init__(self, customer_data: Mapping, sorted_customer_ids, product_data: Mapping,
+                 number: int = 0, customer_pages: Optional[Dict[int, PageDelta]] = None,
+                 product_overlay: Optional[Dict[str, Optional[Dict]]] = None,
+                 customer_keys: Optional[KeyBitmap] = None):
+        self.customer_data = customer_data
+        self.sorted_customer_ids = sorted_customer_ids
+        self.customer_keys = customer_keys if customer_keys is not None else KeyBitmap(sorted_customer_ids)
+        self.product_data = product_data
+        self.number = number
+        self.customer_pages: Dict[int, PageDelta] = customer_pages or {}
+        self.product_overlay: Dict[str, Optional[Dict]] = product_overlay or {}
+        self.page_count = max(1, -(-len(sorted_customer_ids) // MASTER_PAGE_SIZE))
+    
+    def page_of(self, customer_id: int) -> int:
+        """Page whose base key range holds the key (keys outside go to the first/last page)"""
+        position = bisect_right(self.sorted_customer_ids, customer_id) - 1
+        return min(max(position, 0) // MASTER_PAGE_SIZE, self.page_count - 1)
+    
+    def _base_page_keys(self, page: int):
+        return self.sorted_customer_ids[page * MASTER_PAGE_SIZE:(page + 1) * MASTER_PAGE_SIZE]
+    
+    def get_page(self, page: int) -> List[Dict]:
+        """All current customers of one partition page"""
+        delta = self.customer_pages.get(page)
+        if delta:
+            return [self.get_customer(cid) for cid in delta.keys]
+        return [self.customer_data[cid] for cid in self._base_page_keys(page)]
+    
+    def has_customer(self, customer_id: int) -> bool:
+        """Existence check without touching customer records (base bitmap + page deltas)"""
+        if self.customer_pages:
+            delta = self.customer_pages.get(self.page_of(customer_id))
+            if delta:
+                if customer_id in delta.upserts:
+                    return True
+                if customer_id in delta.deleted:
+                    return False
+        return customer_id in self.customer_keys
+    
+    def get_customer(self, customer_id: int) -> Optional[Dict]:
+        if self.customer_pages:
+            delta = self.customer_pages.get(self.page_of(customer_id))
+            if delta:
+                if customer_id in delta.upserts:
+                    return delta.upserts[customer_id]
+                if customer_id in delta.deleted:
+                    return None
+        return self.customer_data.get(customer_id)
+    
+    def get_product(self, product_id: str) -> Optional[Dict]:
+        if product_id in self.product_overlay:
+            return self.product_overlay[product_id]  # None marks a deleted product
+        return self.product_data.get(product_id)
+    
+    def get_customer_partition(self, start_key: int, size: int = DISK_PARTITION_SIZE) -> List[Dict]:
+        if not self.customer_pages:
+            # Find customers with ID >= start_key (binary search on sorted keys)
+            start = bisect_left(self.sorted_customer_ids, start_key)
+            return [self.customer_data[cid] for cid in self.sorted_customer_ids[start:start + size]]
+        
+        partition = []
+        page = self.page_of(start_key)
+        while page < self.page_count and len(partition) < size:
+            delta = self.customer_pages.get(page)
+            keys = delta.keys if delta else self._base_page_keys(page)
+            for cid in keys[bisect_left(keys, start_key):]:
+                partition.append(self.get_customer(cid))
+                if len(partition) >= size:
+                    break
+            page += 1
+        return partition
+    
+    def customer_ids(self):
+        """All current customer IDs in ascending order"""
+        for page in range(self.page_count):
+            delta = self.customer_pages.get(page)
+            yield from (delta.keys if delta else self._base_page_keys(page))
+    
+    def product_ids(self) -> List[str]:
+        """All current product IDs"""
+        ids = [pid for pid in self.product_data if pid not in self.product_overlay]
+        ids.extend(pid for pid, record in self.product_overlay.items() if record is not None)
+        return ids
+    
+    def apply(self, customer_changes: Dict[int, Optional[Dict]],
+              product_changes: Dict[str, Optional[Dict]]) -> 'MasterDataVersion':
+        """
+        Return a new version with the changes applied (None value = delete).
+        Only the pages touched by customer changes are copied.
+        """
+        pages = dict(self.customer_pages)
+        changes_by_page: Dict[int, Dict[int, Optional[Dict]]] = defaultdict(dict)
+        for customer_id, record in customer_changes.items():
+            changes_by_page[self.page_of(customer_id)][customer_id] = record
+        
+        for page, changes in changes_by_page.items():
+            old = pages.get(page)
+            upserts = dict(old.upserts) if old else {}
+            deleted = set(old.deleted) if old else set()
+            for customer_id, record in changes.items():
+                if record is None:
+                    upserts.pop(customer_id, None)
+                    deleted.add(customer_id)
+                else:
+                    upserts[customer_id] = record
+                    deleted.discard(customer_id)
+            pages[page] = PageDelta(self._base_page_keys(page), upserts, deleted)
+        
+        product_overlay = self.product_overlay
+        if product_changes:
+            product_overlay = dict(product_overlay)
+            product_overlay.update(product_changes)
+        
+        return MasterDataVersion(self.customer_data, self.sorted_customer_ids, self.product_data,
+                                 self.number + 1, pages, product_overlay, self.customer_keys)
+
+
 # =====================================================
 # MASTER DATA MANAGER (Disk-based Relation R)
 # =====================================================
@@ -212,71 +1225,609 @@ class MasterDataManager:
     """
     Manages disk-based master data (Customer & Product).
     Provides indexed access for partition loading.
+
+    With columnar=True the relations are held in ColumnarTable stores
+    (typed arrays + dictionary-encoded strings) instead of one dict per
+    record; get_customer/get_product and partitions work the same.
+
+    With db_config the relations are read from the customer_master and
+    product_master tables instead of the CSV files.
+
+    With snapshot_path the parsed CSV relations and indexes are cached in a
+    binary snapshot; later runs load it instead of re-parsing, as long as the
+    source files still have the recorded size and mtime.
+
+    The loaded relations are never modified. Upserts/deletes from a change
+    file or the master_changes table produce new MasterDataVersion objects;
+    readers use current_version() to probe one consistent snapshot.
     """
-    def __init__(self, customer_file: str, product_file: str):
-        self.customer_data: Dict[int, Dict] = {}  # Indexed by Customer_ID
-        self.product_data: Dict[str, Dict] = {}   # Indexed by Product_ID
+    def __init__(self, customer_file: Optional[str] = None, product_file: Optional[str] = None,
+                 columnar: bool = False, db_config: Optional[Dict] = None,
+                 snapshot_path: Optional[str] = None):
+        load_start = time.time()
+        if not db_config and snapshot_path and \
+                self._load_snapshot(snapshot_path, [customer_file, product_file], columnar):
+            print(f"[MasterData] Loaded {len(self.customer_data)} customers and "
+                  f"{len(self.product_data)} products from snapshot in {time.time() - load_start:.2f}s")
+            self._init_versions()
+            return
+        
+        self.columnar = columnar
+        if columnar:
+            self.customer_data: Mapping = ColumnarTable('Customer_ID', CUSTOMER_SCHEMA)
+            self.product_data: Mapping = ColumnarTable('Product_ID', PRODUCT_SCHEMA)
+        else:
+            self.customer_data: Mapping = {}  # Indexed by Customer_ID
+            self.product_data: Mapping = {}   # Indexed by Product_ID
         self.customer_ids: List[int] = []
         self.product_ids: List[str] = []
         
-        self._load_customer_data(customer_file)
-        self._load_product_data(product_file)
+        if db_config:
+            self._load_from_database(db_config)
+        else:
+            self._load_customer_data(customer_file)
+            self._load_product_data(product_file)
+        self._build_partition_index()
+        self._init_versions()
+        
+        print(f"[MasterData] Loaded {len(self.customer_data)} customers"
+              f"{' (columnar)' if columnar else ''}{' from MySQL' if db_config else ''}")
+        print(f"[MasterData] Loaded {len(self.product_data)} products "
+              f"in {time.time() - load_start:.2f}s")
         
-        print(f"[MasterData] Loaded {len(self.customer_data)} customers")
-        print(f"[MasterData] Loaded {len(self.product_data)} products")
+        if not db_config and snapshot_path:
+            self._save_snapshot(snapshot_path, [customer_file, product_file])
+    
+    # Attributes that make up a snapshot (relations + indexes)
+    SNAPSHOT_FIELDS = ('columnar', 'customer_data', 'product_data',
+                       'customer_ids', 'product_ids', 'sorted_customer_ids')
+    
+    @staticmethod
+    def _source_signature(source_files: List[str]) -> List[Dict]:
+        """Size and mtime of each source file, used to validate a snapshot"""
+        signature = []
+        for path in source_files:
+            st = os.stat(path)
+            signature.append({'path': os.path.abspath(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns})
+        return signature
+    
+    def _save_snapshot(self, snapshot_path: str, source_files: List[str]):
+        """
+        Write a versioned binary snapshot:
+        magic | version (u16) | header length (u32) | JSON header | pickled state
+        """
+        header = json.dumps({
+            'sources': self._source_signature(source_files),
+            'columnar': self.columnar
+        }).encode('utf-8')
+        state = {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
+        tmp_path = snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(SNAPSHOT_MAGIC + struct.pack('<HI', SNAPSHOT_VERSION, len(header)))
+                f.write(header)
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, snapshot_path)
+            print(f"[MasterData] Snapshot written to {snapshot_path}")
+        except OSError as e:
+            print(f"[MasterData] Could not write snapshot {snapshot_path}: {e}")
+    
+    def _load_snapshot(self, snapshot_path: str, source_files: List[str], columnar: bool) -> bool:
+        """Restore state from a snapshot if it matches the current source files"""
+        if not os.path.exists(snapshot_path):
+            return False
+        try:
+            with open(snapshot_path, 'rb') as f:
+                prefix = f.read(len(SNAPSHOT_MAGIC) + 6)
+                if prefix[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                    return False
+                version, header_len = struct.unpack('<HI', prefix[len(SNAPSHOT_MAGIC):])
+                if version != SNAPSHOT_VERSION:
+                    print(f"[MasterData] Snapshot version {version} is stale, re-parsing sources")
+                    return False
+                header = json.loads(f.read(header_len).decode('utf-8'))
+                if header['columnar'] != columnar:
+                    print("[MasterData] Snapshot has a different storage layout, re-parsing sources")
+                    return False
+                if header['sources'] != self._source_signature(source_files):
+                    print("[MasterData] Source files changed since snapshot, re-parsing sources")
+                    return False
+                state = pickle.load(f)
+        except (OSError, ValueError, KeyError, struct.error, pickle.UnpicklingError, EOFError) as e:
+            print(f"[MasterData] Ignoring unreadable snapshot {snapshot_path}: {e}")
+            return False
+        
+        for field in self.SNAPSHOT_FIELDS:
+            setattr(self, field, state[field])
+        return True
+    
+    def _store(self, table: Mapping, key: Any, record: Dict):
+        """Store a parsed record in either representation"""
+        if self.columnar:
+            table.append(record)
+        else:
+            table[key] = record
+    
+    def _build_partition_index(self):
+        """Prepare sorted customer keys so partitions are found by binary search"""
+        if self.columnar:
+            self.customer_data.finalize()
+            self.product_data.finalize()
+            self.sorted_customer_ids = self.customer_data.keys_sorted()
+            # The key columns already hold the IDs; no separate lists needed
+            self.customer_ids = self.customer_data.columns['Customer_ID']
+            self.product_ids = self.product_data.columns['Product_ID']
+        else:
+            self.sorted_customer_ids = sorted(self.customer_data)
+    
+    def _add_customer(self, record: Dict):
+        self._store(self.customer_data, record['Customer_ID'], record)
+        if not self.columnar:
+            self.customer_ids.append(record['Customer_ID'])
+    
+    def _add_product(self, record: Dict):
+        self._store(self.product_data, record['Product_ID'], record)
+        if not self.columnar:
+            self.product_ids.append(record['Product_ID'])
     
     def _load_customer_data(self, filepath: str):
         """Load customer master data from CSV"""
         with open(filepath, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
-                customer_id = int(row['Customer_ID'])
-                self.customer_data[customer_id] = {
-                    'Customer_ID': customer_id,
+                self._add_customer({
+                    'Customer_ID': int(row['Customer_ID']),
                     'Gender': row['Gender'],
                     'Age': row['Age'],
                     'Occupation': int(row['Occupation']),
                     'City_Category': row['City_Category'],
                     'Stay_Years': row['Stay_In_Current_City_Years'],
                     'Marital_Status': int(row['Marital_Status'])
-                }
-                self.customer_ids.append(customer_id)
+                })
     
     def _load_product_data(self, filepath: str):
         """Load product master data from CSV"""
         with open(filepath, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
-                product_id = row['Product_ID']
-                self.product_data[product_id] = {
-                    'Product_ID': product_id,
+                self._add_product({
+                    'Product_ID': row['Product_ID'],
                     'Product_Category': row['Product_Category'],
                     'Price': float(row['price$']),
                     'Store_ID': int(row['storeID']),
                     'Supplier_ID': int(row['supplierID']),
                     'Store_Name': row['storeName'],
                     'Supplier_Name': row['supplierName']
-                }
-                self.product_ids.append(product_id)
+                })
+    
+    def _load_from_database(self, db_config: Dict):
+        """
+        Load master data from the customer_master and product_master tables.
+        Uses an unbuffered cursor so rows are streamed from the server in
+        fetchmany batches and only one batch is held in memory at a time.
+        """
+        connection = mysql.connector.connect(**db_config)
+        try:
+            customer_sql = (
+                "SELECT Customer_ID, Gender, Age, Occupation, City_Category, "
+                "Stay_In_Current_City_Years, Marital_Status FROM customer_master"
+            )
+            for cid, gender, age, occupation, city, stay, marital in \
+                    self._stream_rows(connection, customer_sql):
+                self._add_customer({
+                    'Customer_ID': int(cid),
+                    'Gender': gender,
+                    'Age': age,
+                    'Occupation': int(occupation),
+                    'City_Category': city,
+                    'Stay_Years': stay,
+                    'Marital_Status': int(marital)
+                })
+            
+            product_sql = (
+                "SELECT Product_ID, Product_Category, price, storeID, supplierID, "
+                "storeName, supplierName FROM product_master"
+            )
+            for pid, category, price, store_id, supplier_id, store_name, supplier_name in \
+                    self._stream_rows(connection, product_sql):
+                self._add_product({
+                    'Product_ID': pid,
+                    'Product_Category': category,
+                    'Price': float(price),
+                    'Store_ID': int(store_id),
+                    'Supplier_ID': int(supplier_id),
+                    'Store_Name': store_name,
+                    'Supplier_Name': supplier_name
+                })
+        finally:
+            connection.close()
+    
+    @staticmethod
+    def _stream_rows(connection, sql: str, batch_size: int = MASTER_FETCH_SIZE):
+        """Yield rows of a query, fetched from the server in batches"""
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
+    def _init_versions(self):
+        """Start version history at the freshly loaded relations"""
+        self.version = MasterDataVersion(self.customer_data, self.sorted_customer_ids, self.product_data)
+        self.refresh_lock = threading.Lock()
+        self.change_file_offsets: Dict[str, int] = {}  # Bytes already applied per change file
+        self.change_table_high_water = 0                # Last applied master_changes.change_id
+        self.rejected_changes = 0                       # Malformed changes skipped
+        self.deleted_customers = deque()                # (version number, Customer_ID) not yet taken by the join
+    
+    def current_version(self) -> MasterDataVersion:
+        """Consistent snapshot of master data for a sequence of probes"""
+        return self.version
+    
+    def approx_bytes(self) -> int:
+        """
+        Approximate bytes of the loaded relations (cached; dict layout is
+        estimated from a sample of records). Refresh overlays are small and
+        not included.
+        """
+        if getattr(self, '_approx_bytes', None) is None:
+            total = 0
+            for table in (self.customer_data, self.product_data):
+                if isinstance(table, ColumnarTable):
+                    total += table.approx_bytes()
+                elif table:
+                    sample = [table[k] for k in itertools.islice(table, 1000)]
+                    per_record = sum(approx_tuple_bytes(r) for r in sample) / len(sample)
+                    total += sys.getsizeof(table) + int(per_record * len(table))
+            if not self.columnar:
+                total += sys.getsizeof(self.customer_ids) + sys.getsizeof(self.product_ids)
+                total += sys.getsizeof(self.sorted_customer_ids)
+            self._approx_bytes = total
+        return self._approx_bytes
     
     def get_customer(self, customer_id: int) -> Optional[Dict]:
         """Get customer by ID"""
-        return self.customer_data.get(customer_id)
+        return self.version.get_customer(customer_id)
     
     def get_product(self, product_id: str) -> Optional[Dict]:
         """Get product by ID"""
-        return self.product_data.get(product_id)
+        return self.version.get_product(product_id)
     
     def get_customer_partition(self, start_key: int, size: int = DISK_PARTITION_SIZE) -> List[Dict]:
         """Load a partition of customers starting from a key"""
-        # Find customers with ID >= start_key
-        partition = []
-        for cid in sorted(self.customer_ids):
-            if cid >= start_key:
-                partition.append(self.customer_data[cid])
-                if len(partition) >= size:
+        return self.version.get_customer_partition(start_key, size)
+    
+    # -------------------------------------------------
+    # Incremental refresh
+    # -------------------------------------------------
+    
+    def apply_changes(self, changes: List[Dict]) -> int:
+        """
+        Apply master data changes and publish a new version.
+        Each change is {'op': 'upsert'|'delete', 'relation': 'customer'|'product',
+        'record': {...}} with records using the same field names as the loaded data
+        (a delete only needs the key field). Malformed changes are skipped and
+        logged. Returns the number of changes applied.
+        """
+        customer_changes: Dict[int, Optional[Dict]] = {}
+        product_changes: Dict[str, Optional[Dict]] = {}
+        applied = 0
+        for change in changes:
+            try:
+                relation, key, record = self._parse_change(change)
+            except (KeyError, ValueError, TypeError) as e:
+                self.reject_change(change, e)
+                continue
+            if relation == 'customer':
+                customer_changes[key] = record
+            else:
+                product_changes[key] = record
+            applied += 1
+        
+        if customer_changes or product_changes:
+            with self.refresh_lock:
+                self.version = self.version.apply(customer_changes, product_changes)
+                self.deleted_customers.extend((self.version.number, customer_id)
+                                              for customer_id, record in customer_changes.items() if record is None)
+        return applied
+    
+    def take_deleted_customers(self, number: int) -> List[int]:
+        """Customer_IDs deleted by versions up to 'number' since the last call (the join evicts their tuples)"""
+        with self.refresh_lock:
+            deleted = []
+            while self.deleted_customers and self.deleted_customers[0][0] <= number:
+                deleted.append(self.deleted_customers.popleft()[1])
+            return deleted
+    
+    def _parse_change(self, change: Any) -> Tuple[str, Any, Optional[Dict]]:
+        """(relation, key, record or None for a delete) of one change; raises if malformed"""
+        if not isinstance(change, dict) or not isinstance(change.get('record'), dict):
+            raise ValueError("change is not an object with a 'record' object")
+        op, relation, record = change.get('op'), change.get('relation'), change['record']
+        if op not in ('upsert', 'delete'):
+            raise ValueError(f"unknown op {op!r}")
+        delete = op == 'delete'
+        if relation == 'customer':
+            return relation, int(record['Customer_ID']), None if delete else self._customer_record(record)
+        if relation == 'product':
+            product_id = record['Product_ID']
+            if not isinstance(product_id, str):
+                raise ValueError(f"Product_ID {product_id!r} is not a string")
+            return relation, product_id, None if delete else self._product_record(record)
+        raise ValueError(f"unknown relation {relation!r}")
+    
+    def reject_change(self, change: Any, error: Exception):
+        """Count and log a change that cannot be applied (it is not retried)"""
+        self.rejected_changes += 1
+        print(f"[MasterData] Skipping malformed change ({type(error).__name__}: {error}): {str(change)[:200]}")
+    
+    @staticmethod
+    def _customer_record(record: Dict) -> Dict:
+        return {
+            'Customer_ID': int(record['Customer_ID']),
+            'Gender': record['Gender'],
+            'Age': record['Age'],
+            'Occupation': int(record['Occupation']),
+            'City_Category': record['City_Category'],
+            'Stay_Years': record['Stay_Years'],
+            'Marital_Status': int(record['Marital_Status'])
+        }
+    
+    @staticmethod
+    def _product_record(record: Dict) -> Dict:
+        return {
+            'Product_ID': record['Product_ID'],
+            'Product_Category': record['Product_Category'],
+            'Price': float(record['Price']),
+            'Store_ID': int(record['Store_ID']),
+            'Supplier_ID': int(record['Supplier_ID']),
+            'Store_Name': record['Store_Name'],
+            'Supplier_Name': record['Supplier_Name']
+        }
+    
+    def refresh_from_file(self, change_file: str) -> int:
+        """
+        Apply changes appended to a JSON-lines change file since the last call.
+        Only complete lines are consumed; a partially written last line is
+        picked up on the next refresh. Lines that are not valid JSON are
+        skipped; the offset moves past the lines once they have been applied.
+        """
+        if not os.path.exists(change_file):
+            return 0
+        offset = self.change_file_offsets.get(change_file, 0)
+        changes = []
+        with open(change_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
                     break
-        return partition
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    changes.append(json.loads(line))
+                except ValueError as e:
+                    self.reject_change(line.decode('utf-8', 'replace').strip(), e)
+        applied = self.apply_changes(changes)
+        self.change_file_offsets[change_file] = offset
+        return applied
+    
+    def refresh_from_table(self, connection) -> int:
+        """Apply rows added to the master_changes table since the last call"""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "SELECT change_id, relation, op, payload FROM master_changes "
+                "WHERE change_id > %s ORDER BY change_id",
+                (self.change_table_high_water,)
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not rows:
+            return 0
+        changes = []
+        for change_id, relation, op, payload in rows:
+            try:
+                changes.append({'relation': relation, 'op': op, 'record': json.loads(payload)})
+            except (ValueError, TypeError) as e:
+                self.reject_change({'change_id': change_id, 'payload': payload}, e)
+        applied = self.apply_changes(changes)
+        self.change_table_high_water = rows[-1][0]
+        return applied
+
+# =====================================================
+# DW BULK LOADER (LOAD DATA LOCAL INFILE)
+# =====================================================
+
+# MySQL error numbers meaning LOAD DATA LOCAL is disabled on client or server
+LOCAL_INFILE_DISABLED_ERRNOS = {1148, 2068, 3948}
+
+
+class BulkLoader:
+    """
+    Streams enriched rows into rotating local TSV segment files and ingests
+    each full segment into DW_ENRICHED_TRANSACTIONS with LOAD DATA LOCAL
+    INFILE. If local_infile is disabled, segments are loaded with batched
+    INSERTs instead (and LOAD DATA is not tried again).
+    
+    With segment_rows None the owner decides when a segment is ingested
+    (HybridJoin flushes it with the commit that the full segment triggers).
+    
+    With on_loaded, the rows of the current segment are also kept in memory
+    (with the time they were added) and passed to on_loaded once the segment
+    is ingested, minus any row the INSERT fallback could not load.
+    """
+    def __init__(self, connection, segment_rows: Optional[int] = BULK_SEGMENT_ROWS,
+                 directory: Optional[str] = None,
+                 on_loaded: Optional[Callable[[List[Tuple[float, Tuple]]], None]] = None):
+        self.connection = connection
+        self.segment_rows = segment_rows
+        self.directory = directory or tempfile.mkdtemp(prefix='hybridjoin_dw_')
+        self.on_loaded = on_loaded
+        self.local_infile = True
+        self.segment = None
+        self.segment_path: Optional[str] = None
+        self.segment_count = 0
+        self.segment_no = 0
+        self.segment_values: List[Tuple[float, Tuple]] = []  # (added at, row) while on_loaded is set
+        self.segment_failed: List[int] = []                  # Lines of the segment that could not be loaded
+        # Statistics
+        self.rows_loaded = 0
+        self.rows_unreported = 0   # Rows loaded since the last take_loaded()
+        self.rows_bulk_loaded = 0
+        self.load_time = 0.0
+        self.segments_loaded = 0
+    
+    @staticmethod
+    def _tsv_field(value: Any) -> str:
+        if value is None:
+            return '\\N'
+        if isinstance(value, str):
+            return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+        return str(value)
+    
+    @staticmethod
+    def _parse_field(field: str) -> Optional[str]:
+        if field == '\\N':
+            return None
+        if '\\' not in field:
+            return field
+        escapes = {'t': '\t', 'n': '\n', '\\': '\\'}
+        out, i = [], 0
+        while i < len(field):
+            if field[i] == '\\' and i + 1 < len(field):
+                out.append(escapes.get(field[i + 1], field[i + 1]))
+                i += 2
+            else:
+                out.append(field[i])
+                i += 1
+        return ''.join(out)
+    
+    def add(self, values: Tuple):
+        """Append one row (values in DW_COLUMNS order) to the current segment"""
+        start = time.perf_counter()
+        if self.segment is None:
+            self.segment_no += 1
+            self.segment_path = os.path.join(self.directory, f'segment_{self.segment_no:06d}.tsv')
+            self.segment = open(self.segment_path, 'w', encoding='utf-8', newline='\n')
+            self.segment_count = 0
+        self.segment.write('\t'.join(self._tsv_field(v) for v in values) + '\n')
+        self.segment_count += 1
+        if self.on_loaded:
+            self.segment_values.append((time.time(), values))
+        self.load_time += time.perf_counter() - start
+        if self.segment_rows and self.segment_count >= self.segment_rows:
+            self.flush()
+    
+    def add_many(self, rows: List[Tuple]):
+        for values in rows:
+            self.add(values)
+    
+    def flush(self) -> int:
+        """Ingest the current segment (if any) and rotate to a new one"""
+        if self.segment is None:
+            return 0
+        start = time.perf_counter()
+        self.segment.close()
+        path, count = self.segment_path, self.segment_count
+        self.segment = None
+        self.segment_failed = []
+        loaded = self._ingest(path, count) if count else 0
+        os.remove(path)
+        if self.on_loaded:
+            self._report_loaded(path, count, loaded)
+        self.rows_loaded += loaded
+        self.rows_unreported += loaded
+        self.segments_loaded += 1
+        self.load_time += time.perf_counter() - start
+        return loaded
+    
+    def _report_loaded(self, path: str, count: int, loaded: int):
+        """Pass the rows of an ingested segment that reached the DW to on_loaded"""
+        rows, self.segment_values = self.segment_values, []
+        if self.segment_failed:
+            failed = set(self.segment_failed)
+            rows = [row for line, row in enumerate(rows) if line not in failed]
+        elif loaded < count:
+            # LOAD DATA does not say which lines it skipped (the DW table has no
+            # unique key besides the generated id, so this is not expected)
+            print(f"[BulkLoader] LOAD DATA loaded {loaded:,} of {count:,} rows of {path}; "
+                  f"skipped lines are still reported as loaded")
+        if rows:
+            self.on_loaded(rows)
+    
+    def take_loaded(self) -> int:
+        """Rows loaded since the last call, including segments add() ingested when full"""
+        loaded, self.rows_unreported = self.rows_unreported, 0
+        return loaded
+    
+    def _ingest(self, path: str, count: int) -> int:
+        if self.local_infile:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(
+                    "LOAD DATA LOCAL INFILE %s INTO TABLE DW_ENRICHED_TRANSACTIONS "
+                    "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                    f"({', '.join(DW_COLUMNS)})",
+                    (path,)
+                )
+                loaded = cursor.rowcount if cursor.rowcount >= 0 else count
+                self.rows_bulk_loaded += loaded
+                return loaded
+            except Error as e:
+                if e.errno in LOCAL_INFILE_DISABLED_ERRNOS:
+                    self.local_infile = False
+                    print(f"[BulkLoader] LOAD DATA LOCAL INFILE unavailable ({e}); "
+                          f"falling back to batched INSERTs")
+                else:
+                    print(f"[BulkLoader] LOAD DATA failed for {path}: {e}; loading with INSERTs")
+            finally:
+                cursor.close()
+        return self._insert_segment(path)
+    
+    def _insert_segment(self, path: str) -> int:
+        """Fallback: load a segment with executemany batches (row by row on error)"""
+        loaded = 0
+        line_no = 0
+        cursor = self.connection.cursor()
+        try:
+            with open(path, 'r', encoding='utf-8', newline='\n') as f:
+                while True:
+                    rows = [tuple(self._parse_field(field) for field in line.rstrip('\n').split('\t'))
+                            for line in itertools.islice(f, INSERT_BATCH_SIZE)]
+                    if not rows:
+                        break
+                    try:
+                        cursor.executemany(DW_INSERT_SQL, rows)
+                        loaded += len(rows)
+                    except Error:
+                        for offset, values in enumerate(rows):
+                            try:
+                                cursor.execute(DW_INSERT_SQL, values)
+                                loaded += 1
+                            except Error:
+                                self.segment_failed.append(line_no + offset)  # Skipped, not retried
+                    line_no += len(rows)
+        finally:
+            cursor.close()
+        return loaded
+    
+    def rows_per_second(self) -> float:
+        return self.rows_loaded / self.load_time if self.load_time else 0.0
+    
+    def close(self):
+        """Ingest the last segment and remove the segment directory"""
+        self.flush()
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
 
 
 # =====================================================
@@ -291,37 +1842,126 @@ class HybridJoin:
     Uses hash table, queue, and disk buffer for efficient processing.
     """
     
-    def __init__(self, db_config: Dict, master_data: MasterDataManager):
+    def __init__(self, db_config: Dict, master_data: MasterDataManager,
+                 checkpoint_path: Optional[str] = None,
+                 master_change_file: Optional[str] = None, master_change_table: bool = False,
+                 partition_policy: str = PARTITION_POLICY,
+                 hash_memory_budget: Optional[int] = HASH_TABLE_MEMORY_BUDGET,
+                 memory_budget: Optional[int] = MEMORY_BUDGET,
+                 dw_sink: str = DW_SINK_MODE,
+                 index_mode: str = DW_INDEX_MODE,
+                 source_table: Optional[str] = None,
+                 follow_source: bool = False,
+                 dedup: bool = DEDUP_ENABLED,
+                 dead_letter_path: Optional[str] = None,
+                 profile_dir: Optional[str] = None,
+                 profile_port: Optional[int] = None,
+                 latency_target: Optional[float] = LATENCY_TARGET,
+                 window_aggregates: bool = False):
         self.db_config = db_config
         self.master_data = master_data
         
         # Core data structures
-        self.hash_table = HashTable(HASH_TABLE_SLOTS)
+        self.hash_table = HashTable(HASH_TABLE_SLOTS, memory_budget=hash_memory_budget)
         self.queue = DoublyLinkedQueue()
         self.stream_buffer = StreamBuffer()
         self.disk_buffer: List[Dict] = []
         
+        # Memory accounting per component (budget enforced if given)
+        self.memory = MemoryManager(memory_budget)
+        self.memory.register('stream_buffer', self.stream_buffer.approx_bytes)
+        self.memory.register('hash_table', lambda: self.hash_table.memory_used())
+        self.memory.register('queue', lambda: self.queue.approx_bytes())
+        self.memory.register('disk_buffer', self.disk_buffer_bytes)
+        self.memory.register('master_data', master_data.approx_bytes)
+        self.dedup = DuplicateFilter() if dedup else None
+        self.dead_letters = DeadLetterSink(dead_letter_path)
+        if self.dedup:
+            self.memory.register('dedup_filter', self.dedup.approx_bytes)
+        self.product_retry = ProductRetryBuffer()
+        self.memory.register('product_retry', self.product_retry.approx_bytes)
+        
+        # Partition selection
+        self.partition_policy = partition_policy
+        self.histogram = PartitionHistogram()
+        self.histogram_version = master_data.current_version().number
+        self.loaded_page: Optional[int] = None  # Page loaded by the benefit policy this iteration
+        self.max_tuple_wait = MAX_TUPLE_WAIT
+        
         # Control variables
-        self.w = HASH_TABLE_SLOTS  # Available slots
+        self.w = self.hash_table.available_slots()  # Available slots
         self.running = False
         self.joined_count = 0
         self.processed_count = 0
         
-        # Database connection
+        # Database connection and DW sink
         self.db_connection = None
+        self.dw_sink = dw_sink
+        self.bulk_loader: Optional[BulkLoader] = None
+        self.index_mode = index_mode
+        self.commit_policy = CommitPolicy()
+        
+        # Rolling aggregates of emitted rows (API + DW_WINDOW_AGGREGATES summary table)
+        self.aggregates = WindowedAggregates(DW_COLUMNS) if window_aggregates else None
+        
+        # Latency mode: tune partition choice, batching and commits for a p99 delay target
+        self.slo = LatencySLO(latency_target) if latency_target else None
+        if self.slo:
+            self.max_tuple_wait = min(MAX_TUPLE_WAIT, latency_target * SLO_WAIT_SHARE)
+            self.commit_policy.max_age = min(COMMIT_MAX_AGE, latency_target * SLO_COMMIT_SHARE)
+        self.latency_baseline = {'max_tuple_wait': self.max_tuple_wait,
+                                 'commit_max_age': self.commit_policy.max_age,
+                                 'commit_max_rows': self.commit_policy.max_rows}
+        
+        # Stream source: the transaction file passed to run(), or a MySQL table;
+        # follow_source keeps polling for new rows instead of stopping at the end
+        self.source_table = source_table
+        self.follow_source = follow_source
+        
+        # Checkpointing (disabled when no path is given)
+        self.checkpoint = CheckpointManager(checkpoint_path) if checkpoint_path else None
+        self.source: Optional[Dict] = None  # Descriptor of the stream source of the current run
+        self.start_offset = 0          # Producer offset to resume from (byte offset or orderID)
+        self.admitted_offset = 0       # File offset past the last tuple admitted to the queue
+        self.admitted_count = 0        # Stream tuples admitted to the queue so far
+        self.commit_seq = 0            # Number of DW commits (last committed batch)
+        self.dw_start_id = 0           # Highest DW transaction_id before this run wrote anything
+        self.resumed_joined = 0        # Joins already committed before a resume
+        
+        # Live master data refresh (change file and/or master_changes table)
+        self.master_change_file = master_change_file
+        self.master_change_table = master_change_table
+        self.refresh_stop = threading.Event()
+        self.refresh_polls = 0         # Completed refresh polls (deferred product lookups wait for the next)
+        
+        # On-demand profiling of the live run (SIGUSR1 / control socket), reports under profile_dir
+        self.profiler = JoinProfiler(profile_dir, control_port=profile_port) if profile_dir else None
         
         # Statistics
         self.stats = {
             'stream_tuples_received': 0,
             'tuples_joined': 0,
             'tuples_loaded_to_dw': 0,
-            'partitions_loaded': 0
+            'partitions_loaded': 0,
+            'checkpoints_written': 0,
+            'resumed_tuples_skipped': 0,
+            'resume_restore_time': 0.0,
+            'master_refreshes': 0,
+            'master_changes_applied': 0,
+            'age_forced_loads': 0,
+            'max_tuple_wait': 0.0,
+            'dw_load_time': 0.0,
+            'dw_flush_time': 0.0,
+            'index_build_time': 0.0
         }
     
     def connect_database(self):
         """Connect to MySQL database"""
+        config = dict(self.db_config)
+        if self.dw_sink == 'bulk':
+            config.setdefault('allow_local_infile', True)
         try:
-            self.db_connection = mysql.connector.connect(**self.db_config)
+            self.db_connection = mysql.connector.connect(**config)
             print("[HybridJoin] Connected to database successfully")
             return True
         except Error as e:
@@ -361,69 +2001,488 @@ class HybridJoin:
         )
         """
         cursor.execute(create_sql)
+        
+        # Rows up to here are history; everything this run writes is also held in memory
+        cursor.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM DW_ENRICHED_TRANSACTIONS")
+        row = cursor.fetchone()
+        self.dw_start_id = row[0] if row else 0
+        
+        # Physical design for the load: with deferred indexing an empty table is
+        # loaded bare and secondary indexes are built once afterwards. A table
+        # that already holds data keeps (or gets) its indexes, since analysts
+        # query it during the run and a crash would leave it unindexed
+        existing = self.existing_dw_indexes(cursor)
+        if self.index_mode == 'deferred' and self.dw_start_id:
+            print("[HybridJoin] DW table already holds data; maintaining indexes instead of deferring")
+            self.index_mode = 'immediate'
+        if self.index_mode == 'deferred' and existing:
+            cursor.execute("ALTER TABLE DW_ENRICHED_TRANSACTIONS " +
+                           ", ".join(f"DROP INDEX {name}" for name in existing))
+            print(f"[HybridJoin] Dropped {len(existing)} secondary indexes of the empty table for bulk loading")
+        elif self.index_mode == 'immediate':
+            self.build_dw_indexes(cursor, existing)
+        
+        if self.aggregates:
+            cursor.execute(AGG_TABLE_SQL)
+        
         self.db_connection.commit()
         print("[HybridJoin] DW_ENRICHED_TRANSACTIONS table ready")
         cursor.close()
     
+    @staticmethod
+    def existing_dw_indexes(cursor) -> List[str]:
+        """Names of DW_SECONDARY_INDEXES already present on the DW table"""
+        cursor.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'DW_ENRICHED_TRANSACTIONS'"
+        )
+        present = {row[0] for row in cursor.fetchall()}
+        return [name for name in DW_SECONDARY_INDEXES if name in present]
+    
+    def build_dw_indexes(self, cursor=None, existing: Optional[List[str]] = None):
+        """Add all missing secondary indexes with a single ALTER TABLE (one table pass)"""
+        if not self.db_connection:
+            return
+        own_cursor = cursor is None
+        if own_cursor:
+            cursor = self.db_connection.cursor()
+        try:
+            if existing is None:
+                existing = self.existing_dw_indexes(cursor)
+            missing = [name for name in DW_SECONDARY_INDEXES if name not in existing]
+            if not missing:
+                return
+            start = time.time()
+            cursor.execute("ALTER TABLE DW_ENRICHED_TRANSACTIONS " +
+                           ", ".join(f"ADD INDEX {name} ({DW_SECONDARY_INDEXES[name]})" for name in missing))
+            self.stats['index_build_time'] += time.time() - start
+            print(f"[HybridJoin] Built {len(missing)} secondary indexes in "
+                  f"{self.stats['index_build_time']:.2f} seconds")
+        except Error as e:
+            print(f"[HybridJoin] Secondary index build failed: {e}")
+        finally:
+            if own_cursor:
+                cursor.close()
+    
     def load_to_dw(self, enriched_tuple: Dict):
         """Load enriched tuple into Data Warehouse"""
         if not self.db_connection:
             return
         
-        cursor = self.db_connection.cursor()
-        
-        insert_sql = """
-        INSERT INTO DW_ENRICHED_TRANSACTIONS 
-        (order_id, order_date, quantity, customer_id, gender, age, occupation,
-         city_category, stay_years, marital_status, product_id, product_category,
-         price, store_id, supplier_id, store_name, supplier_name, total_amount)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        values = (
-            enriched_tuple.get('order_id'),
-            enriched_tuple.get('order_date'),
-            enriched_tuple.get('quantity'),
-            enriched_tuple.get('customer_id'),
-            enriched_tuple.get('gender'),
-            enriched_tuple.get('age'),
-            enriched_tuple.get('occupation'),
-            enriched_tuple.get('city_category'),
-            enriched_tuple.get('stay_years'),
-            enriched_tuple.get('marital_status'),
-            enriched_tuple.get('product_id'),
-            enriched_tuple.get('product_category'),
-            enriched_tuple.get('price'),
-            enriched_tuple.get('store_id'),
-            enriched_tuple.get('supplier_id'),
-            enriched_tuple.get('store_name'),
-            enriched_tuple.get('supplier_name'),
-            enriched_tuple.get('total_amount')
-        )
+        values = tuple(enriched_tuple.get(column) for column in DW_COLUMNS)
+        self.commit_policy.record(1, dw_row_bytes(values))
+        if self.bulk_loader:
+            self.bulk_loader.add(values)  # Counted (and aggregated) when the segment is ingested
+            return
         
+        start = time.perf_counter()
+        cursor = self.db_connection.cursor()
         try:
-            cursor.execute(insert_sql, values)
+            cursor.execute(DW_INSERT_SQL, values)
             self.stats['tuples_loaded_to_dw'] += 1
+            if self.aggregates:
+                self.aggregates.add_rows([values])
         except Error as e:
             pass  # Skip duplicates or errors silently
         finally:
             cursor.close()
+            self.stats['dw_load_time'] += time.perf_counter() - start
+    
+    def load_batch_to_dw(self, rows: List[Tuple]):
+        """
+        Load a batch of enriched rows (value tuples in DW_COLUMNS order)
+        with a single executemany. Falls back to row-by-row inserts if the
+        batch fails, so one bad row does not drop the rest.
+        """
+        if not self.db_connection or not rows:
+            return
+        self.commit_policy.record(len(rows), sum(dw_row_bytes(row) for row in rows))
+        if self.bulk_loader:
+            self.bulk_loader.add_many(rows)
+            return
+        
+        start = time.perf_counter()
+        cursor = self.db_connection.cursor()
+        loaded = rows
+        try:
+            cursor.executemany(DW_INSERT_SQL, rows)
+            self.stats['tuples_loaded_to_dw'] += len(rows)
+        except Error:
+            loaded = []
+            for values in rows:
+                try:
+                    cursor.execute(DW_INSERT_SQL, values)
+                    self.stats['tuples_loaded_to_dw'] += 1
+                    loaded.append(values)
+                except Error:
+                    pass  # Skip duplicates or errors silently
+        finally:
+            cursor.close()
+            self.stats['dw_load_time'] += time.perf_counter() - start
+        if self.aggregates:
+            self.aggregates.add_rows(loaded)
+    
+    def flush_dw(self):
+        """Ingest rows still buffered by the bulk loader"""
+        if self.bulk_loader:
+            self.bulk_loader.flush()
+            self.stats['tuples_loaded_to_dw'] += self.bulk_loader.take_loaded()
+            self.stats['dw_load_time'] = self.bulk_loader.load_time
+    
+    def flush_aggregates(self):
+        """Write closed tumbling windows and the current sliding windows to DW_WINDOW_AGGREGATES"""
+        rows = self.aggregates.summary_rows()
+        cursor = self.db_connection.cursor()
+        try:
+            cursor.execute(AGG_CLEAR_SLIDING_SQL)
+            if rows:
+                cursor.executemany(AGG_UPSERT_SQL, rows)
+        except Error as e:
+            print(f"[HybridJoin] Window aggregate flush failed: {e}")
+        finally:
+            cursor.close()
+    
+    def commit_dw(self, reason: str = 'final'):
+        """Commit the current DW batch and checkpoint progress"""
+        start = time.perf_counter()
+        self.flush_dw()
+        # Bulk segment ingest is load work, not commit latency: keep it out of
+        # the time that drives the adaptive row target
+        self.stats['dw_flush_time'] += time.perf_counter() - start
+        start = time.perf_counter()
+        # Summary rows go into the same transaction as the rows they cover
+        if self.aggregates and self.db_connection and (reason == 'final' or self.aggregates.flush_due()):
+            self.flush_aggregates()
+        if self.db_connection:
+            self.db_connection.commit()
+        if self.aggregates:
+            self.aggregates.committed()
+        self.commit_policy.committed(time.perf_counter() - start, reason)
+        if self.slo and self.slo.committed(time.time()):
+            self.apply_latency_level(self.slo.level)
+            print(f"[LatencySLO] Commit p99 delay {self.slo.last_p99 * 1000:.1f} ms "
+                  f"(target {self.slo.target * 1000:.0f} ms): knob level {self.slo.level:.3f}")
+        self.commit_seq += 1
+        self.save_checkpoint()
+    
+    def apply_latency_level(self, level: float):
+        """Scale the latency knobs to 'level' times their SLO baseline"""
+        baseline = self.latency_baseline
+        policy = self.commit_policy
+        self.max_tuple_wait = baseline['max_tuple_wait'] * level
+        # Committing more often than a commit takes would spend the budget on commits
+        commit_p50, _, _ = CommitPolicy.percentiles(list(itertools.islice(reversed(policy.commit_times), 100)))
+        policy.max_age = max(baseline['commit_max_age'] * level, commit_p50)
+        policy.max_rows = max(policy.min_rows, int(baseline['commit_max_rows'] * level))
+        policy.row_target = min(policy.row_target, policy.max_rows)
+    
+    def save_checkpoint(self):
+        """Record producer offset, in-flight queue and last committed DW batch"""
+        if not self.checkpoint:
+            return
+        # In-flight tuples are stored as a binary record batch; tuples the
+        # record format cannot hold (e.g. unusual product IDs) fall back to JSON
+        in_flight = self.in_flight_tuples()
+        try:
+            in_flight_state = {'in_flight_records': base64.b64encode(encode_batch(in_flight)).decode('ascii')}
+        except ValueError:
+            in_flight_state = {'in_flight': in_flight}
+        replayable = self.source is None or self.source['kind'] != 'producer'
+        self.checkpoint.save({
+            'source': self.source,
+            'producer_offset': self.admitted_offset if replayable else None,
+            'admitted_count': self.admitted_count,
+            **in_flight_state,
+            'commit_seq': self.commit_seq,
+            'stats': {
+                'tuples_joined': self.stats['tuples_joined'],
+                'tuples_loaded_to_dw': self.stats['tuples_loaded_to_dw'],
+                'partitions_loaded': self.stats['partitions_loaded']
+            }
+        })
+        self.stats['checkpoints_written'] += 1
+    
+    def in_flight_tuples(self) -> List[Dict]:
+        """Tuples admitted from the stream but not yet joined (oldest first), then deferred ones"""
+        return self.queue.snapshot() + self.product_retry.snapshot()
+    
+    def window_state(self) -> Dict[str, float]:
+        """Live join window gauges: free slots (w), hash entries, queue length, oldest tuple age"""
+        return {
+            'free_slots': self.w,
+            'hash_entries': self.hash_table.total_entries,
+            'queue_length': len(self.queue),
+            'oldest_tuple_age': self.queue.peek_oldest_age()
+        }
+    
+    def resume_from_checkpoint(self) -> bool:
+        """
+        Restore state from the last checkpoint, if any.
+        In-flight tuples are re-admitted to the hash table and queue, and
+        the producer will seek past everything already admitted.
+        """
+        if not self.checkpoint:
+            return False
+        restore_start = time.time()
+        state = self.checkpoint.load()
+        if state is None:
+            return False
+        mismatch = self.source_mismatch(state.get('source'), state['producer_offset'])
+        if mismatch:
+            print(f"[Checkpoint] Ignoring checkpoint {self.checkpoint.path}: {mismatch}")
+            return False
+        
+        if 'in_flight_records' in state:
+            in_flight = records_to_tuples(decode_batch(base64.b64decode(state['in_flight_records'])))
+        else:
+            in_flight = state['in_flight']
+        master = self.master_data.current_version()
+        for tuple_data in in_flight:
+            if self.slo:
+                tuple_data['_arrived'] = restore_start  # Delay is measured from the resume
+            else:
+                tuple_data.pop('_arrived', None)
+            self.admit_tuple(tuple_data, master)
+        
+        # Producers that cannot replay (network input) save no offset
+        self.start_offset = self.admitted_offset = state['producer_offset'] or 0
+        self.admitted_count = state['admitted_count']
+        self.commit_seq = state['commit_seq']
+        self.stats.update(state['stats'])
+        self.stats['stream_tuples_received'] = self.admitted_count
+        self.stats['resumed_tuples_skipped'] = self.admitted_count
+        self.resumed_joined = self.stats['tuples_joined']
+        self.stats['resume_restore_time'] = time.time() - restore_start
+        
+        print(f"[Checkpoint] Resumed at offset {self.start_offset} after DW batch {self.commit_seq}: "
+              f"{len(in_flight)} in-flight tuples restored, "
+              f"{self.stats['resumed_tuples_skipped']:,} tuples not re-streamed "
+              f"({self.stats['resume_restore_time']:.3f}s)")
+        return True
+    
+    def describe_source(self, transaction_file: Optional[str] = None, producer=None) -> Dict:
+        """Identity of the stream source, saved with checkpoints so an offset is only reused for it"""
+        if producer:
+            server = getattr(producer, '__self__', None)
+            address = getattr(server, 'address', None)
+            return {'kind': 'producer', 'name': getattr(producer, '__qualname__', type(producer).__name__),
+                    'port': address[1] if address else None}
+        if self.source_table:
+            return {'kind': 'table', 'table': self.source_table,
+                    'host': self.db_config.get('host'), 'database': self.db_config.get('database')}
+        path = os.path.abspath(transaction_file)
+        if os.path.isdir(path):
+            return {'kind': 'directory', 'path': path}
+        return {'kind': 'file', 'path': path, 'inode': os.stat(path).st_ino if os.path.exists(path) else None}
+    
+    def source_mismatch(self, saved: Optional[Dict], offset: Any) -> Optional[str]:
+        """Why a checkpoint cannot be resumed by this run's source (None if it can)"""
+        if saved != self.source:
+            return f"it was written for source {saved}, this run reads {self.source}"
+        if saved['kind'] == 'file' and isinstance(offset, int) and offset > os.path.getsize(saved['path']):
+            return f"offset {offset:,} lies past the end of {saved['path']} (file was replaced or truncated)"
+        return None
+    
+    def disk_buffer_bytes(self) -> int:
+        """Approximate bytes of the loaded partition"""
+        return self.partition_bytes(self.disk_buffer)
+    
+    def partition_bytes(self, partition: List[Dict]) -> int:
+        """Approximate bytes of a loaded partition (records are shared with dict-layout master data)"""
+        if not partition:
+            return 0
+        per_record = approx_tuple_bytes(partition[0]) if self.master_data.columnar else 0
+        return sys.getsizeof(partition) + len(partition) * per_record
+    
+    def admit_tuple(self, tuple_data: Dict, master: MasterDataVersion):
+        """Add a stream tuple to the queue and hash table"""
+        # Use Customer_ID as join key
+        join_key = tuple_data['customer_id']
+        
+        # No partition can ever match an unknown customer; keep it out of the join window
+        if not master.has_customer(join_key):
+            self.dead_letters.write(tuple_data, 'orphan_customer')
+            return
+        
+        # Add to queue (FIFO order)
+        queue_node = self.queue.enqueue(join_key, tuple_data)
+        
+        # Add to hash table with reference to queue node
+        self.hash_table.insert(join_key, tuple_data, queue_node)
+        self.histogram.add(master.page_of(join_key))
+        
+        self.w -= 1
+    
+    def evict_orphans(self, master: MasterDataVersion):
+        """
+        Dead-letter waiting tuples whose customer was deleted by a master
+        refresh after admission (no partition will ever match them, and at
+        the head of the queue they would pin the oldest key forever).
+        Found by key through the hash table, for the customers the refresh deleted.
+        """
+        for customer_id in self.master_data.take_deleted_customers(master.number):
+            if master.has_customer(customer_id):
+                continue  # Inserted again by a later change
+            for data, node in self.hash_table.lookup(customer_id):
+                self.hash_table.remove(customer_id, node)
+                self.queue.remove_node(node)
+                self.histogram.remove(master.page_of(customer_id))
+                self.dead_letters.write(data, 'orphan_customer')
+                self.w += 1
+    
+    def defer_unknown_product(self, stream_tuple: Dict):
+        """
+        Hold a tuple whose product lookup failed for a re-probe after the next
+        master refresh; dead-letter it right away when no refresh will come
+        """
+        refreshing = self.master_change_file or self.master_change_table
+        if not refreshing or not self.product_retry.add(stream_tuple, self.refresh_polls):
+            self.dead_letters.write(stream_tuple, 'unknown_product')
+    
+    def retry_unknown_products(self, final: bool = False):
+        """
+        Re-probe deferred tuples once a refresh poll has passed since they were
+        deferred ('final' re-probes all of them); joins what now matches and
+        dead-letters the rest
+        """
+        poll = self.refresh_polls
+        if not final and not self.product_retry.ready(poll):
+            return
+        # Read after the poll count: that poll's version is already published
+        master = self.master_data.current_version()
+        rows = []
+        for stream_tuple in self.product_retry.take(None if final else poll):
+            customer_data = master.get_customer(stream_tuple['customer_id'])
+            product_data = master.get_product(stream_tuple['product_id'])
+            if customer_data is None:
+                self.dead_letters.write(stream_tuple, 'orphan_customer')
+            elif product_data is None:
+                self.dead_letters.write(stream_tuple, 'unknown_product')
+            else:
+                enriched_tuple = self.enrich_tuple(stream_tuple, stream_tuple['customer_id'], customer_data, product_data)
+                rows.append(tuple(enriched_tuple.get(column) for column in DW_COLUMNS))
+                if self.slo:
+                    self.slo.record(stream_tuple.get('_arrived'))
+        self.load_batch_to_dw(rows)
+        self.product_retry.recovered += len(rows)
+        self.stats['tuples_joined'] += len(rows)
+    
+    def load_partition(self, master: MasterDataVersion, oldest_key: Any) -> List[Dict]:
+        """
+        Choose and load the next disk partition.
+        'oldest' loads the partition starting at the oldest waiting key.
+        'benefit' loads the page with the most matchable waiting tuples,
+        unless the oldest tuple has waited longer than max_tuple_wait.
+        """
+        if self.partition_policy != 'benefit':
+            return master.get_customer_partition(oldest_key, DISK_PARTITION_SIZE)
+        
+        if master.number != self.histogram_version:
+            self.histogram.reset_unmatchable()
+            self.histogram_version = master.number
+        
+        # Age bound: serve the oldest tuple's page first, unless nothing
+        # waiting there can match (e.g. it holds only unmatchable tuples)
+        page = master.page_of(oldest_key)
+        if self.queue.peek_oldest_age() > self.max_tuple_wait and self.histogram.benefit(page) > 0:
+            self.stats['age_forced_loads'] += 1
+        else:
+            page = self.histogram.best_page()
+            if page is None:
+                page = master.page_of(oldest_key)
+        partition = master.get_page(page)
+        self.loaded_page = page
+        return partition
+    
+    @staticmethod
+    def enrich_tuple(stream_tuple: Dict, customer_id: int, customer_data: Dict, product_data: Dict) -> Dict:
+        """Build the enriched DW tuple for one stream tuple and its master records"""
+        return {
+            # Transaction data
+            'order_id': stream_tuple['order_id'],
+            'order_date': stream_tuple['order_date'],
+            'quantity': stream_tuple['quantity'],
+            # Customer data (enrichment)
+            'customer_id': customer_id,
+            'gender': customer_data['Gender'],
+            'age': customer_data['Age'],
+            'occupation': customer_data['Occupation'],
+            'city_category': customer_data['City_Category'],
+            'stay_years': customer_data['Stay_Years'],
+            'marital_status': customer_data['Marital_Status'],
+            # Product data (enrichment)
+            'product_id': stream_tuple['product_id'],
+            'product_category': product_data['Product_Category'],
+            'price': product_data['Price'],
+            'store_id': product_data['Store_ID'],
+            'supplier_id': product_data['Supplier_ID'],
+            'store_name': product_data['Store_Name'],
+            'supplier_name': product_data['Supplier_Name'],
+            # Calculated
+            'total_amount': stream_tuple['quantity'] * product_data['Price']
+        }
+    
+    def feed_stream(self, tuple_data: Dict, delay: float = 0.0):
+        """Put one tuple into the stream buffer; every STREAM_BATCH_SIZE tuples pause and apply backpressure"""
+        if self.dedup and self.dedup.is_duplicate(tuple_data['order_id']):
+            return  # Replayed order_id: never reaches the join or the DW
+        if self.slo:
+            tuple_data['_arrived'] = time.time()
+        self.stream_buffer.put(tuple_data)
+        self.stats['stream_tuples_received'] += 1
+        
+        if self.stats['stream_tuples_received'] % STREAM_BATCH_SIZE == 0:
+            if delay:
+                time.sleep(delay)
+            
+            # Hold back while the join components are over the memory budget
+            self.memory.throttle_producer(lambda: self.stream_buffer.size() > 0,
+                                          lambda: self.running)
+            
+            # Progress update
+            if self.stats['stream_tuples_received'] % 10000 == 0:
+                print(f"[StreamProducer] Streamed {self.stats['stream_tuples_received']} tuples...")
     
     def stream_producer(self, transaction_file: str):
         """
         THREAD 1: Stream Producer
         Continuously reads transactional data from CSV and feeds into stream buffer.
         Simulates near-real-time data arrival.
+        With follow_source it tails the file instead (like 'tail -f'), and a
+        directory path is read as a rotating set of CSV files in name order.
         """
-        print(f"[StreamProducer] Starting to stream from {transaction_file}")
+        print(f"[StreamProducer] Starting to stream from {transaction_file}"
+              f"{' (following new data)' if self.follow_source else ''}")
         
-        with open(transaction_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            batch = []
+        if os.path.isdir(transaction_file):
+            self.stream_directory(transaction_file)
+        else:
+            self.stream_file(transaction_file, self.start_offset if isinstance(self.start_offset, int) else 0)
+        
+        self.stream_buffer.mark_finished()
+        print(f"[StreamProducer] Finished streaming {self.stats['stream_tuples_received']} tuples")
+    
+    def stream_file(self, path: str, start_offset: int = 0, rotated=None, offset_name: Optional[str] = None):
+        """
+        Stream one CSV file from a byte offset. Returns at end of file, or when
+        following, once the run stops or rotated() reports a newer file.
+        Tuple offsets are byte offsets, or [offset_name, byte offset] inside a directory.
+        """
+        # Read line by line in binary mode so the byte offset of every
+        # tuple is known (needed for checkpoint/resume)
+        with open(path, 'rb') as f:
+            lines = self._read_lines(f, rotated)
+            header_line = next(lines, None)
+            if header_line is None:
+                return
+            header = next(csv.reader([header_line.decode('utf-8')]))
+            if start_offset:
+                f.seek(start_offset)
             
-            for row in reader:
-                if not self.running:
-                    break
+            for line in lines:
+                if not line.strip():
+                    continue
+                row = dict(zip(header, next(csv.reader([line.decode('utf-8')]))))
                 
                 # Parse transaction tuple
                 tuple_data = {
@@ -431,22 +2490,134 @@ class HybridJoin:
                     'customer_id': int(row['Customer_ID']),
                     'product_id': row['Product_ID'],
                     'quantity': int(row['quantity']),
-                    'order_date': row['date']
+                    'order_date': row['date'],
+                    '_offset': [offset_name, f.tell()] if offset_name else f.tell()
                 }
                 
-                self.stream_buffer.put(tuple_data)
-                self.stats['stream_tuples_received'] += 1
+                # Simulate real-time streaming with small delay (not needed when tailing live data)
+                self.feed_stream(tuple_data, delay=0.0 if self.follow_source else STREAM_DELAY)
+    
+    def _read_lines(self, f, rotated=None):
+        """
+        Yield the complete lines of a binary file. When following, a partial
+        last line (a record still being written) is left unread and the file
+        is polled again, backing off from TAIL_POLL_MIN to TAIL_POLL_MAX.
+        """
+        poll = TAIL_POLL_MIN
+        last_look = False
+        while self.running:
+            position = f.tell()
+            line = f.readline()
+            if line.endswith(b'\n'):
+                poll = TAIL_POLL_MIN
+                yield line
+                continue
+            if not self.follow_source or last_look:
+                if line:
+                    yield line  # Final line of a complete file without a newline
+                return
+            
+            # End of data or a partial line: rewind to the line start and wait
+            f.seek(position)
+            if rotated and rotated():
+                last_look = True  # A newer file exists; read what is left once more
+                continue
+            time.sleep(poll)
+            poll = min(poll * 2, TAIL_POLL_MAX)
+    
+    @staticmethod
+    def _next_file(directory: str, after: Optional[str]) -> Optional[str]:
+        """First CSV file name in the directory that sorts after 'after'"""
+        names = sorted(name for name in os.listdir(directory)
+                       if name.endswith('.csv') and (after is None or name > after))
+        return names[0] if names else None
+    
+    def stream_directory(self, directory: str):
+        """
+        Stream the CSV files of a rotating directory in name order (name files
+        so they sort by creation, e.g. transactions-20240101-0001.csv). A file
+        is complete once a newer one exists; the checkpoint offset is
+        [file name, byte offset].
+        """
+        current, offset = self.start_offset if isinstance(self.start_offset, list) else (None, 0)
+        while current is None and self.running:
+            current = self._next_file(directory, None)
+            if current is None:
+                if not self.follow_source:
+                    return
+                time.sleep(TAIL_POLL_MAX)  # Wait for the first file
+        
+        while current and self.running:
+            name = current
+            print(f"[StreamProducer] Reading {name}")
+            self.stream_file(os.path.join(directory, name), offset,
+                             rotated=lambda: self._next_file(directory, name) is not None,
+                             offset_name=name)
+            if not self.running:
+                break
+            current, offset = self._next_file(directory, name), 0
+    
+    def table_producer(self):
+        """
+        THREAD 1 (table source): Stream Producer
+        Streams the transactional_data table in orderID order using keyset
+        pagination (WHERE orderID > last seen ... LIMIT n on the primary key),
+        so every page is an index range scan rather than an OFFSET scan.
+        The last orderID admitted is the checkpoint offset. With follow_source
+        the producer keeps polling for rows inserted after the high-water mark.
+        """
+        print(f"[StreamProducer] Streaming from table {self.source_table}"
+              f"{' (following new rows)' if self.follow_source else ''}")
+        page_sql = (
+            f"SELECT orderID, Customer_ID, Product_ID, quantity, order_date FROM {self.source_table} "
+            f"WHERE orderID > %s ORDER BY orderID LIMIT {SOURCE_PAGE_ROWS}"
+        )
+        high_water = self.start_offset if self.start_offset else -1
+        
+        try:
+            connection = mysql.connector.connect(**self.db_config)
+        except Error as e:
+            print(f"[StreamProducer] Cannot connect to source table: {e}")
+            self.stream_buffer.mark_finished()
+            return
+        
+        try:
+            while self.running:
+                rows_in_page = 0
+                cursor = connection.cursor(buffered=False)
+                try:
+                    cursor.execute(page_sql, (high_water,))
+                    while True:
+                        rows = cursor.fetchmany(SOURCE_FETCH_SIZE)
+                        if not rows:
+                            break
+                        for order_id, customer_id, product_id, quantity, order_date in rows:
+                            self.feed_stream({
+                                'order_id': int(order_id),
+                                'customer_id': int(customer_id),
+                                'product_id': product_id,
+                                'quantity': int(quantity),
+                                'order_date': str(order_date),
+                                '_offset': int(order_id)
+                            })
+                        rows_in_page += len(rows)
+                        high_water = int(rows[-1][0])
+                finally:
+                    cursor.close()
+                connection.commit()  # End the read snapshot so new rows become visible
                 
-                # Simulate real-time streaming with small delay
-                if self.stats['stream_tuples_received'] % STREAM_BATCH_SIZE == 0:
-                    time.sleep(STREAM_DELAY)
-                    
-                    # Progress update
-                    if self.stats['stream_tuples_received'] % 10000 == 0:
-                        print(f"[StreamProducer] Streamed {self.stats['stream_tuples_received']} tuples...")
+                if rows_in_page < SOURCE_PAGE_ROWS:
+                    if not self.follow_source:
+                        break
+                    time.sleep(SOURCE_POLL_INTERVAL)  # Caught up: wait for new rows
+        except Error as e:
+            print(f"[StreamProducer] Source table read failed: {e}")
+        finally:
+            connection.close()
         
         self.stream_buffer.mark_finished()
-        print(f"[StreamProducer] Finished streaming {self.stats['stream_tuples_received']} tuples")
+        print(f"[StreamProducer] Finished streaming {self.stats['stream_tuples_received']} tuples "
+              f"(high-water orderID {high_water})")
     
     def join_consumer(self):
         """
@@ -456,35 +2627,46 @@ class HybridJoin:
         print("[JoinConsumer] Starting HYBRIDJOIN algorithm...")
         
         iteration = 0
-        commit_batch = 0
         
         while self.running or not self.stream_buffer.is_finished() or not self.hash_table.is_empty():
             iteration += 1
             
+            # Pin one master data version so this iteration's probes see a
+            # consistent snapshot even if a refresh is published meanwhile
+            master = self.master_data.current_version()
+            
             # =====================================================
             # STEP 1: Load stream tuples into hash table
             # =====================================================
             # Get up to 'w' tuples from stream buffer
+            self.w = self.hash_table.available_slots()
+            
+            # Moving a tuple from the stream buffer into the join window only
+            # adds its hash entry and queue node; cap that growth by the budget
+            allowance = self.memory.admission_allowance(
+                HASH_ENTRY_OVERHEAD_BYTES + QUEUE_NODE_BYTES,
+                minimum=STREAM_BATCH_SIZE if self.hash_table.is_empty() else 0)
+            if allowance is not None and allowance < self.w:
+                self.w = allowance
+                self.memory.admission_limited += 1
+            
             tuples_to_load = min(self.w, self.stream_buffer.size())
             
             if tuples_to_load > 0:
                 stream_tuples = self.stream_buffer.get_batch(tuples_to_load)
                 
                 for tuple_data in stream_tuples:
-                    # Use Customer_ID as join key
-                    join_key = tuple_data['customer_id']
-                    
-                    # Add to queue (FIFO order)
-                    queue_node = self.queue.enqueue(join_key, tuple_data)
-                    
-                    # Add to hash table with reference to queue node
-                    self.hash_table.insert(join_key, tuple_data, queue_node)
-                    
-                    self.w -= 1
+                    self.admit_tuple(tuple_data, master)
+                    self.admitted_offset = tuple_data.get('_offset', self.admitted_offset)
+                    self.admitted_count += 1
+            
+            # Tuples deferred for an unknown product get their re-probe
+            self.retry_unknown_products()
             
             # =====================================================
             # STEP 2: Get oldest key and load disk partition
             # =====================================================
+            self.evict_orphans(master)
             oldest_key = self.queue.peek_oldest_key()
             
             if oldest_key is None:
@@ -494,8 +2676,10 @@ class HybridJoin:
                 continue
             
             # Load partition from master data (disk) into disk buffer
-            self.disk_buffer = self.master_data.get_customer_partition(oldest_key, DISK_PARTITION_SIZE)
+            self.loaded_page = None
+            self.disk_buffer = self.load_partition(master, oldest_key)
             self.stats['partitions_loaded'] += 1
+            now = time.time()
             
             # =====================================================
             # STEP 3: Probe hash table with disk buffer tuples
@@ -511,71 +2695,94 @@ class HybridJoin:
                     # STEP 4: Generate join output (enriched tuple)
                     # =====================================================
                     product_id = stream_tuple['product_id']
-                    product_data = self.master_data.get_product(product_id)
+                    product_data = master.get_product(product_id)
                     
                     if product_data:
                         # Create enriched tuple by joining all data
-                        enriched_tuple = {
-                            # Transaction data
-                            'order_id': stream_tuple['order_id'],
-                            'order_date': stream_tuple['order_date'],
-                            'quantity': stream_tuple['quantity'],
-                            # Customer data (enrichment)
-                            'customer_id': customer_id,
-                            'gender': customer_data['Gender'],
-                            'age': customer_data['Age'],
-                            'occupation': customer_data['Occupation'],
-                            'city_category': customer_data['City_Category'],
-                            'stay_years': customer_data['Stay_Years'],
-                            'marital_status': customer_data['Marital_Status'],
-                            # Product data (enrichment)
-                            'product_id': product_id,
-                            'product_category': product_data['Product_Category'],
-                            'price': product_data['Price'],
-                            'store_id': product_data['Store_ID'],
-                            'supplier_id': product_data['Supplier_ID'],
-                            'store_name': product_data['Store_Name'],
-                            'supplier_name': product_data['Supplier_Name'],
-                            # Calculated
-                            'total_amount': stream_tuple['quantity'] * product_data['Price']
-                        }
+                        enriched_tuple = self.enrich_tuple(stream_tuple, customer_id, customer_data, product_data)
                         
                         # Load enriched tuple into DW
                         self.load_to_dw(enriched_tuple)
                         self.stats['tuples_joined'] += 1
+                        if self.slo:
+                            self.slo.record(stream_tuple.get('_arrived'))
+                    else:
+                        # Stale product catalog: retry after the next refresh
+                        self.defer_unknown_product(stream_tuple)
                     
                     # =====================================================
                     # STEP 5: Remove matched tuple from hash table and queue
                     # =====================================================
                     self.hash_table.remove(customer_id, queue_node)
                     self.queue.remove_node(queue_node)
+                    self.histogram.remove(master.page_of(customer_id))
+                    self.stats['max_tuple_wait'] = max(self.stats['max_tuple_wait'],
+                                                       now - queue_node.enqueued_at)
                     
                     # Free up slot
                     self.w += 1
             
-            # Commit periodically
-            commit_batch += 1
-            if commit_batch >= 100:
-                if self.db_connection:
-                    self.db_connection.commit()
-                commit_batch = 0
+            if self.loaded_page is not None:
+                self.histogram.mark_loaded(self.loaded_page)
+            
+            # Group commit (and checkpoint) when the commit policy says so
+            reason = self.commit_policy.due()
+            if reason:
+                self.commit_dw(reason)
             
             # Progress update
             if iteration % 100 == 0:
                 print(f"[JoinConsumer] Iteration {iteration}: Joined={self.stats['tuples_joined']}, "
                       f"Queue={len(self.queue)}, HashTable={self.hash_table.total_entries}")
         
-        # Final commit
-        if self.db_connection:
-            self.db_connection.commit()
+        # Last re-probe of deferred tuples, then final commit
+        self.retry_unknown_products(final=True)
+        self.commit_dw()
         
         print(f"[JoinConsumer] HYBRIDJOIN completed!")
         print(f"[JoinConsumer] Total joined: {self.stats['tuples_joined']}")
     
-    def run(self, transaction_file: str):
+    def master_refresher(self):
+        """
+        THREAD 3: Master data refresher
+        Polls the change file / master_changes table and publishes new master
+        data versions while the join keeps running.
+        """
+        print("[MasterRefresher] Watching for master data changes...")
+        connection = None
+        if self.master_change_table:
+            try:
+                connection = mysql.connector.connect(**self.db_config)
+            except Error as e:
+                print(f"[MasterRefresher] Cannot poll master_changes: {e}")
+        
+        while not self.refresh_stop.wait(MASTER_REFRESH_INTERVAL):
+            try:
+                applied = 0
+                if self.master_change_file:
+                    applied += self.master_data.refresh_from_file(self.master_change_file)
+                if connection:
+                    applied += self.master_data.refresh_from_table(connection)
+                    connection.commit()  # End the read snapshot so new rows become visible
+            except (Error, OSError, ValueError, KeyError) as e:
+                print(f"[MasterRefresher] Refresh failed: {e}")
+                continue
+            self.refresh_polls += 1
+            if applied:
+                self.stats['master_refreshes'] += 1
+                self.stats['master_changes_applied'] += applied
+                print(f"[MasterRefresher] Applied {applied} changes "
+                      f"(version {self.master_data.current_version().number})")
+        
+        if connection:
+            connection.close()
+    
+    def run(self, transaction_file: Optional[str] = None, producer=None):
         """
         Main execution method.
         Starts both threads and coordinates the join operation.
+        Streams transaction_file, or source_table when one is configured;
+        'producer' replaces both (e.g. IngestServer.serve for network input).
         """
         print("\n" + "=" * 70)
         print("HYBRIDJOIN ALGORITHM - Near Real-Time Data Warehouse")
@@ -588,33 +2795,78 @@ class HybridJoin:
         
         # Create DW table
         self.create_dw_table()
+        if self.dw_sink == 'bulk':
+            # Segments are sized by BULK_SEGMENT_ROWS and ingested by the commit
+            # they trigger, so a checkpoint never leaves joined rows in a segment
+            self.bulk_loader = BulkLoader(self.db_connection, segment_rows=None,
+                                          on_loaded=self.aggregates.add_timed_rows if self.aggregates else None)
+            self.commit_policy.segment_rows = BULK_SEGMENT_ROWS
+        
+        # Pick up where a previous (crashed) run over the same source left off
+        self.source = self.describe_source(transaction_file, producer)
+        resumed = self.resume_from_checkpoint()
         
         self.running = True
         
         # Create threads
-        producer_thread = threading.Thread(
-            target=self.stream_producer,
-            args=(transaction_file,),
-            name="StreamProducer"
-        )
+        if producer:
+            producer_thread = threading.Thread(target=producer, name="StreamProducer")
+        elif self.source_table:
+            producer_thread = threading.Thread(target=self.table_producer, name="StreamProducer")
+        else:
+            producer_thread = threading.Thread(
+                target=self.stream_producer,
+                args=(transaction_file,),
+                name="StreamProducer"
+            )
         
         consumer_thread = threading.Thread(
             target=self.join_consumer,
             name="JoinConsumer"
         )
         
+        refresher_thread = None
+        if self.master_change_file or self.master_change_table:
+            refresher_thread = threading.Thread(
+                target=self.master_refresher,
+                name="MasterRefresher",
+                daemon=True
+            )
+        
         # Start threads
         print("\n[Main] Starting threads...")
         start_time = time.time()
+        if self.profiler:
+            self.profiler.install()
         
+        if refresher_thread:
+            refresher_thread.start()
         producer_thread.start()
-        time.sleep(0.5)  # Let producer get a head start
+        if not self.slo:
+            time.sleep(0.5)  # Let producer get a head start (tuples would wait out of the latency budget)
         consumer_thread.start()
         
-        # Wait for completion
-        producer_thread.join()
+        # Wait for completion (Ctrl+C stops a continuous run and drains the join)
+        try:
+            producer_thread.join()
+        except KeyboardInterrupt:
+            print("\n[Main] Stopping: draining the stream buffer and join window...")
+            self.running = False
+            producer_thread.join()
         self.running = False
         consumer_thread.join()
+        self.refresh_stop.set()
+        if refresher_thread:
+            refresher_thread.join()
+        if self.profiler:
+            self.profiler.close()
+        
+        if self.bulk_loader:
+            self.bulk_loader.close()
+        self.dead_letters.close()
+        load_end_time = time.time()
+        if self.index_mode == 'deferred':
+            self.build_dw_indexes()
         
         end_time = time.time()
         
@@ -626,9 +2878,97 @@ class HybridJoin:
         print(f"  Tuples successfully joined: {self.stats['tuples_joined']:,}")
         print(f"  Tuples loaded to DW:        {self.stats['tuples_loaded_to_dw']:,}")
         print(f"  Disk partitions loaded:     {self.stats['partitions_loaded']:,}")
+        print(f"  Matches per partition load: "
+              f"{self.stats['tuples_joined'] / max(self.stats['partitions_loaded'], 1):,.1f}")
+        print(f"  Max tuple wait:             {self.stats['max_tuple_wait']:.3f} seconds")
+        if self.partition_policy == 'benefit':
+            print(f"  Age-forced partition loads: {self.stats['age_forced_loads']:,}")
+        if self.hash_table.memory_budget:
+            print(f"  Hash table buckets:         {self.hash_table.num_slots:,} "
+                  f"({self.hash_table.resizes:,} resizes, budget {self.hash_table.memory_budget:,} bytes)")
         print(f"  Execution time:             {end_time - start_time:.2f} seconds")
+        print(f"  Join throughput:            {self.stats['tuples_joined'] / max(end_time - start_time, 1e-9):,.0f} tuples/s")
+        if self.bulk_loader:
+            mode = 'LOAD DATA LOCAL INFILE' if self.bulk_loader.local_infile else 'INSERT batches (fallback)'
+            rate = self.bulk_loader.rows_per_second()
+        else:
+            mode = 'INSERT'
+            rate = self.stats['tuples_loaded_to_dw'] / self.stats['dw_load_time'] if self.stats['dw_load_time'] else 0.0
+        print(f"  DW load rate:               {rate:,.0f} rows/s ({mode})")
+        print(f"  DW index mode:              {self.index_mode} "
+              f"(load {load_end_time - start_time:.2f}s + index build {self.stats['index_build_time']:.2f}s)")
+        self.memory.usage()
+        self.stats['memory_peak_bytes'] = dict(self.memory.peak)
+        print(f"  Peak memory (approx.):      {self.memory.peak_total / 1e6:,.1f} MB"
+              f"{f' of {self.memory.budget / 1e6:,.1f} MB budget' if self.memory.budget else ''}")
+        for name, peak in self.memory.peak.items():
+            print(f"    {name + ':':<26}{peak / 1e6:,.2f} MB")
+        if self.memory.budget:
+            print(f"  Producer throttled:         {self.memory.throttle_count:,} times "
+                  f"({self.memory.throttle_time:.2f} seconds)")
+            print(f"  Budget-limited admissions:  {self.memory.admission_limited:,}")
+        if self.dedup:
+            measured = self.dedup.measured_fp_rate()
+            print(f"  Duplicates suppressed:      {self.dedup.suppressed:,} "
+                  f"(recent window {self.dedup.suppressed_window:,}, filter {self.dedup.suppressed_filter:,})")
+            print(f"  Dedup filter FP rate:       "
+                  f"{'n/a' if measured is None else f'{measured:.4%}'} measured "
+                  f"({self.dedup.sample_fresh:,} sampled keys), {self.dedup.expected_fp_rate():.4%} expected")
+        if self.product_retry.deferred or self.dead_letters.counts.get('unknown_product'):
+            print(f"  Unknown product lookups:    {self.product_retry.deferred:,} deferred, "
+                  f"{self.product_retry.recovered:,} joined after a refresh, "
+                  f"{self.dead_letters.counts.get('unknown_product', 0):,} dead-lettered")
+        print(f"  Join match rate:            "
+              f"{self.stats['tuples_joined'] / max(self.stats['stream_tuples_received'], 1):.2%} of stream tuples")
+        if self.dead_letters.total():
+            reasons = ', '.join(f"{reason} {count:,}" for reason, count in sorted(self.dead_letters.counts.items()))
+            print(f"  Dead-lettered tuples:       {self.dead_letters.total():,} "
+                  f"({self.dead_letters.total() / max(self.stats['stream_tuples_received'], 1):.2%} of stream: {reasons})")
+        if self.aggregates:
+            print(f"  Window aggregates:          {self.aggregates.rows:,} rows over "
+                  f"{len(self.aggregates.dimensions)} dimensions, {self.aggregates.flushes:,} summary flushes")
+        if self.slo:
+            delay_p50, delay_p99, delay_max = self.slo.percentiles()
+            print(f"  Latency SLO:                p99 delay target {self.slo.target:.3f}s, "
+                  f"{self.slo.violations:,} of {self.slo.rows:,} rows over target "
+                  f"({self.slo.violations / max(self.slo.rows, 1):.2%})")
+            print(f"  End-to-end delay (recent):  p50 {delay_p50 * 1000:.1f} ms, p99 {delay_p99 * 1000:.1f} ms, "
+                  f"max {self.slo.max_delay * 1000:.1f} ms "
+                  f"({'MET' if delay_p99 <= self.slo.target else 'VIOLATED'})")
+            print(f"  Latency knob level:         {self.slo.level:.3f} after {self.slo.adjustments:,} adjustments "
+                  f"(tuple wait bound {self.max_tuple_wait:.3f}s, commit age {self.commit_policy.max_age:.3f}s)")
+        if self.commit_policy.commits:
+            policy = self.commit_policy
+            rows_p50, rows_p95, _ = CommitPolicy.percentiles(policy.rows_per_commit)
+            time_p50, time_p95, _ = CommitPolicy.percentiles(policy.commit_times)
+            reasons = ', '.join(f"{name} {count:,}" for name, count in sorted(policy.reasons.items()))
+            recent = f" (p50/p95 of the last {len(policy.commit_times):,})" if policy.commits > len(policy.commit_times) else ''
+            print(f"  DW commits:                 {policy.commits:,} ({reasons}){recent}")
+            print(f"  Rows per commit:            p50 {rows_p50:,.0f}, p95 {rows_p95:,.0f}, "
+                  f"max {policy.max_commit_rows:,.0f} (final target {policy.row_target:,})")
+            print(f"  Commit time:                p50 {time_p50 * 1000:.1f} ms, p95 {time_p95 * 1000:.1f} ms, "
+                  f"max {policy.max_commit_time * 1000:.1f} ms")
+            if self.bulk_loader:
+                print(f"  Bulk flush time:            {self.stats['dw_flush_time']:.2f} seconds (before commits)")
+        if self.checkpoint:
+            print(f"  Checkpoints written:        {self.stats['checkpoints_written']:,}")
+        if refresher_thread:
+            print(f"  Master data refreshes:      {self.stats['master_refreshes']:,} "
+                  f"({self.stats['master_changes_applied']:,} changes, "
+                  f"{self.master_data.rejected_changes:,} malformed skipped)")
+        if resumed:
+            # Estimate what a full re-run would have cost at this run's join throughput
+            joined_now = self.stats['tuples_joined'] - self.resumed_joined
+            rerun_estimate = (end_time - start_time) * self.stats['tuples_joined'] / max(joined_now, 1)
+            print(f"  Resume restore time:        {self.stats['resume_restore_time']:.3f} seconds")
+            print(f"  Tuples skipped by resume:   {self.stats['resumed_tuples_skipped']:,}")
+            print(f"  Est. full re-run time:      {rerun_estimate:.2f} seconds")
         print("=" * 70)
         
+        # A clean finish needs no resume point
+        if self.checkpoint and self.stream_buffer.is_finished() and self.hash_table.is_empty():
+            self.checkpoint.clear()
+        
         # Close database connection
         if self.db_connection:
             self.db_connection.close()
@@ -639,6 +2979,19 @@ class HybridJoin:
 # MAIN EXECUTION
 # =====================================================
 
+def detect_memory_limit() -> Optional[int]:
+    """Container memory limit in bytes from cgroup v2/v1, or None if unlimited/unknown"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path, 'r') as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
 def get_database_credentials():
     """Get database credentials from user"""
     print("\n" + "=" * 70)
@@ -696,11 +3049,13 @@ def main():
     
     print("\n[Main] Loading master data...")
     
-    # Load master data (disk-based relation R)
-    master_data = MasterDataManager(customer_file, product_file)
+    # Load master data (disk-based relation R), reusing the parsed snapshot when valid
+    snapshot_file = os.path.join(data_folder, 'master_data.snapshot')
+    master_data = MasterDataManager(customer_file, product_file, snapshot_path=snapshot_file)
     
-    # Create and run HYBRIDJOIN
-    hybrid_join = HybridJoin(db_config, master_data)
+    # Create and run HYBRIDJOIN (resumes automatically if a checkpoint exists)
+    checkpoint_file = os.path.join(data_folder, 'hybrid_join_checkpoint.json')
+    hybrid_join = HybridJoin(db_config, master_data, checkpoint_path=checkpoint_file)
     hybrid_join.run(transaction_file)
     
     print("\n[Main] HYBRIDJOIN execution completed successfully!")
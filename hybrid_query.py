@@ -0,0 +1,148 @@
+"""
+Hybrid Aggregate Queries
+========================
+Revenue, quantity and transaction totals per store, supplier, product
+category or city category, answered from two sources:
+
+- DW history: rows committed before the running HybridJoin started
+  (transaction_id <= join.dw_start_id), aggregated by one GROUP BY per
+  dimension on first use and cached; that part of the DW never changes
+  while the join runs
+- Live state of the join (its window_aggregates): every row the run has
+  loaded, split into committed and not yet committed (open transaction),
+  and optionally the tuples still waiting in the join window, enriched
+  provisionally with the current master data
+
+So fresh answers need no DW scan beyond the first one, and rows show up
+as soon as they are loaded rather than when they are committed (with the
+bulk sink: when their segment is ingested).
+
+Usage (from any thread while join.run() is in progress):
+    query = HybridQuery(join)
+    query.aggregate('store')              # {store_name: (revenue, quantity, transactions)}
+    query.aggregate('city', include_in_flight=True)
+    query.recent('supplier', 300)         # last five minutes, memory only
+
+Author: Shahzeb
+Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
+"""
+
+import threading
+from typing import Dict, Tuple
+
+import mysql.connector
+from mysql.connector import Error
+
+from hybrid_join import HybridJoin
+from stream_aggregates import Totals
+
+Answer = Dict[str, Tuple[float, int, int]]
+
+
+def _add(target: Totals, key, revenue: float, quantity: int, count: int):
+    totals = target.get(key)
+    if totals is None:
+        target[key] = [revenue, quantity, count]
+    else:
+        totals[0] += revenue
+        totals[1] += quantity
+        totals[2] += count
+
+
+class HybridQuery:
+    """Aggregate queries over DW history plus a running HybridJoin's in-memory state"""
+
+    def __init__(self, join: HybridJoin, connection=None):
+        if join.aggregates is None:
+            raise ValueError("hybrid queries need a HybridJoin created with window_aggregates=True")
+        self.join = join
+        self.connection = connection   # Own connection; the join's is not shared across threads
+        self.lock = threading.Lock()
+        self.history: Dict[str, Totals] = {}
+        self.history_scans = 0
+
+    # =====================================================
+    # SOURCES
+    # =====================================================
+
+    def history_totals(self, dimension: str) -> Totals:
+        """Totals of the DW rows committed before the run (queried once per dimension)"""
+        column = self.join.aggregates.dimensions[dimension]
+        with self.lock:
+            if dimension not in self.history:
+                totals: Totals = {}
+                if self.join.dw_start_id:
+                    if self.connection is None:
+                        self.connection = mysql.connector.connect(**self.join.db_config)
+                    cursor = self.connection.cursor()
+                    try:
+                        cursor.execute(
+                            f"SELECT {column}, SUM(total_amount), SUM(quantity), COUNT(*) "
+                            f"FROM DW_ENRICHED_TRANSACTIONS WHERE transaction_id <= %s GROUP BY {column}",
+                            (self.join.dw_start_id,))
+                        for key, revenue, quantity, count in cursor.fetchall():
+                            totals[str(key)] = [float(revenue or 0), int(quantity or 0), int(count)]
+                    finally:
+                        cursor.close()
+                    self.history_scans += 1
+                self.history[dimension] = totals
+            return self.history[dimension]
+
+    def in_flight_totals(self, dimension: str) -> Totals:
+        """Provisional totals of tuples still waiting in the join window"""
+        column = self.join.aggregates.dimensions[dimension]
+        master = self.join.master_data.current_version()
+        totals: Totals = {}
+        try:
+            waiting = self.join.in_flight_tuples()
+        except RuntimeError:
+            return totals  # Window changed during the snapshot; report no in-flight part
+        for stream_tuple in waiting:
+            customer_data = master.get_customer(stream_tuple['customer_id'])
+            product_data = master.get_product(stream_tuple['product_id'])
+            if customer_data is None or product_data is None:
+                continue  # Would not be joined as things stand
+            enriched = self.join.enrich_tuple(stream_tuple, stream_tuple['customer_id'], customer_data, product_data)
+            _add(totals, enriched[column], float(enriched['total_amount']), enriched['quantity'], 1)
+        return totals
+
+    def sources(self, dimension: str, include_in_flight: bool = False) -> Dict[str, Totals]:
+        """Totals per source: 'history', 'committed', 'uncommitted' (and 'in_flight')"""
+        committed, uncommitted = self.join.aggregates.run_totals(dimension)
+        parts = {
+            'history': self.history_totals(dimension),
+            'committed': committed,
+            'uncommitted': uncommitted
+        }
+        if include_in_flight:
+            parts['in_flight'] = self.in_flight_totals(dimension)
+        return parts
+
+    # =====================================================
+    # QUERIES
+    # =====================================================
+
+    def aggregate(self, dimension: str, include_in_flight: bool = False) -> Answer:
+        """{key: (revenue, quantity, transactions)} over all DW history plus the live run"""
+        result: Totals = {}
+        for totals in self.sources(dimension, include_in_flight).values():
+            for key, (revenue, quantity, count) in totals.items():
+                _add(result, str(key), revenue, quantity, count)
+        return {key: (round(revenue, 2), quantity, count) for key, (revenue, quantity, count) in result.items()}
+
+    def recent(self, dimension: str, seconds: int) -> Answer:
+        """Totals of rows emitted in the last 'seconds' (sliding window, memory only)"""
+        return self.join.aggregates.sliding(dimension, seconds)
+
+    def freshness(self, dimension: str, include_in_flight: bool = False) -> Dict[str, int]:
+        """Transactions each source contributes to an answer"""
+        return {source: int(sum(values[2] for values in totals.values()))
+                for source, totals in self.sources(dimension, include_in_flight).items()}
+
+    def close(self):
+        if self.connection:
+            try:
+                self.connection.close()
+            except Error:
+                pass
+            self.connection = None
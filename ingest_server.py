@@ -0,0 +1,226 @@
+"""
+Stream Ingest Server
+====================
+Local TCP endpoint through which upstream services push transactions
+into a running HybridJoin (used as THREAD 1 instead of the file or table
+producers).
+
+Wire formats (chosen per connection):
+- Newline-delimited records: one record per line,
+  "orderID,Customer_ID,Product_ID,quantity,date"
+- Length-prefixed frames: the connection starts with FRAME_MAGIC, then
+  every frame is a 4-byte big-endian payload length followed by the
+  payload, which holds one or more newline-delimited records
+- Binary record frames: the connection starts with RECORD_FRAME_MAGIC and
+  frames are laid out as above, but each payload is a batch of fixed-size
+  binary records (see stream_records.py), decoded without text parsing
+
+Every connection is served by its own thread. Backpressure: records are
+put into the bounded StreamBuffer, so when the join falls behind the put
+blocks, the handler stops reading its socket and TCP flow control slows
+the clients down.
+
+Author: Shahzeb
+Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
+"""
+
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from hybrid_join import HybridJoin
+from stream_records import decode_batch, records_to_tuples
+
+# =====================================================
+# CONFIGURATION CONSTANTS
+# =====================================================
+INGEST_HOST = '127.0.0.1'     # Local interface only
+INGEST_PORT = 9099
+INGEST_RECV_BYTES = 256 * 1024  # Socket read size per recv
+FRAME_MAGIC = b'HJF1'         # Connection preamble selecting length-prefixed text frames
+RECORD_FRAME_MAGIC = b'HJR1'  # Connection preamble selecting length-prefixed binary record frames
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 16 * 1024 * 1024  # Larger frames are a protocol error
+INGEST_DRAIN_TIMEOUT = 10.0   # Seconds open connections may keep draining after the run stops
+
+
+def parse_record(record: bytes) -> Dict:
+    """Parse one "orderID,Customer_ID,Product_ID,quantity,date" record"""
+    order_id, customer_id, product_id, quantity, order_date = record.decode('utf-8').strip().split(',')
+    return {
+        'order_id': int(order_id),
+        'customer_id': int(customer_id),
+        'product_id': product_id,
+        'quantity': int(quantity),
+        'order_date': order_date
+    }
+
+
+def split_lines(buffer: bytearray) -> List[bytes]:
+    """Remove and return the complete lines at the start of the buffer"""
+    end = buffer.rfind(b'\n')
+    if end < 0:
+        return []
+    records = bytes(buffer[:end]).split(b'\n')
+    del buffer[:end + 1]
+    return records
+
+
+def split_frames(buffer: bytearray) -> List[bytes]:
+    """Remove and return the payloads of all complete frames at the start of the buffer"""
+    payloads = []
+    position = 0
+    while len(buffer) - position >= FRAME_HEADER.size:
+        (length,) = FRAME_HEADER.unpack_from(buffer, position)
+        if length > MAX_FRAME_BYTES:
+            raise ValueError(f"frame of {length} bytes exceeds {MAX_FRAME_BYTES}")
+        if len(buffer) - position - FRAME_HEADER.size < length:
+            break
+        start = position + FRAME_HEADER.size
+        payloads.append(bytes(buffer[start:start + length]))
+        position = start + length
+    del buffer[:position]
+    return payloads
+
+
+# =====================================================
+# SERVER
+# =====================================================
+
+class IngestHandler(socketserver.BaseRequestHandler):
+    """Reads one client connection and feeds its records into the join"""
+
+    def handle(self):
+        ingest: IngestServer = self.server.ingest
+        ingest.connection_opened()
+        sock = self.request
+        sock.settimeout(0.5)  # Wake up regularly to notice a stopped run
+        buffer = bytearray()
+        mode = None   # 'lines', 'frames' or 'records'
+        try:
+            # After the run stops, keep draining what the client already sent
+            # until it goes quiet (or the server gives up on stragglers)
+            while not ingest.closed:
+                try:
+                    chunk = sock.recv(INGEST_RECV_BYTES)
+                except socket.timeout:
+                    if not ingest.join.running:
+                        break
+                    continue
+                if not chunk:
+                    break
+                buffer += chunk
+                if mode is None:
+                    if len(buffer) < len(FRAME_MAGIC):
+                        continue
+                    mode = {FRAME_MAGIC: 'frames', RECORD_FRAME_MAGIC: 'records'}.get(bytes(buffer[:4]), 'lines')
+                    if mode != 'lines':
+                        del buffer[:len(FRAME_MAGIC)]
+                if mode == 'records':
+                    for payload in split_frames(buffer):
+                        ingest.feed_tuples(records_to_tuples(decode_batch(payload)))
+                elif mode == 'frames':
+                    ingest.feed([record for payload in split_frames(buffer) for record in payload.split(b'\n')])
+                else:
+                    ingest.feed(split_lines(buffer))
+            if buffer and mode in (None, 'lines'):
+                ingest.feed([bytes(buffer)])  # Last line without a newline
+        except (OSError, ValueError) as e:
+            print(f"[IngestServer] Dropping connection {self.client_address}: {e}")
+        finally:
+            ingest.connection_closed()
+
+
+class ThreadedIngestTCPServer(socketserver.ThreadingTCPServer):
+    """One thread per client connection; a deep accept backlog for many clients"""
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class IngestServer:
+    """
+    Threaded TCP ingest endpoint for a HybridJoin.
+    Pass serve as the join's producer: join.run(producer=server.serve).
+    """
+
+    def __init__(self, join: HybridJoin, host: str = INGEST_HOST, port: int = INGEST_PORT):
+        self.join = join
+        self.address: Tuple[str, int] = (host, port)
+        self.feed_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.closed = False
+        self.stats = {
+            'connections': 0,
+            'active_connections': 0,
+            'records_received': 0,
+            'bad_records': 0
+        }
+        self.server: Optional[ThreadedIngestTCPServer] = None
+
+    def connection_opened(self):
+        with self.stats_lock:
+            self.stats['connections'] += 1
+            self.stats['active_connections'] += 1
+
+    def connection_closed(self):
+        with self.stats_lock:
+            self.stats['active_connections'] -= 1
+
+    def feed(self, records: List[bytes]):
+        """Parse records and put them into the stream buffer (blocks while it is full)"""
+        tuples = []
+        bad = 0
+        for record in records:
+            if not record.strip():
+                continue
+            try:
+                tuples.append(parse_record(record))
+            except (ValueError, UnicodeDecodeError):
+                bad += 1
+        self.feed_tuples(tuples, bad)
+
+    def feed_tuples(self, tuples: List[Dict], bad: int = 0):
+        """Put parsed tuples into the stream buffer in arrival order"""
+        with self.feed_lock:
+            # Network input cannot be replayed, so tuples carry no producer offset
+            # and checkpoints of an ingest run record none (only the in-flight queue)
+            for tuple_data in tuples:
+                self.join.feed_stream(tuple_data)
+            self.stats['records_received'] += len(tuples)
+            self.stats['bad_records'] += bad
+
+    def serve(self):
+        """
+        THREAD 1 (network source): accept connections until the run stops,
+        then mark the stream finished so the join drains.
+        """
+        self.server = ThreadedIngestTCPServer(self.address, IngestHandler)
+        self.server.ingest = self
+        self.address = self.server.server_address
+        print(f"[IngestServer] Listening on {self.address[0]}:{self.address[1]}")
+
+        acceptor = threading.Thread(target=self.server.serve_forever, args=(0.1,),
+                                    name="IngestAcceptor", daemon=True)
+        acceptor.start()
+        start = time.time()
+        while self.join.running:
+            time.sleep(0.1)
+        self.server.shutdown()
+        self.server.server_close()
+
+        # Let open connections drain; they close once their client goes quiet
+        deadline = time.time() + INGEST_DRAIN_TIMEOUT
+        while self.stats['active_connections'] and time.time() < deadline:
+            time.sleep(0.05)
+        self.closed = True
+
+        elapsed = time.time() - start
+        self.join.stream_buffer.mark_finished()
+        print(f"[IngestServer] Stopped: {self.stats['records_received']:,} records from "
+              f"{self.stats['connections']:,} connections "
+              f"({self.stats['records_received'] / max(elapsed, 1e-9):,.0f} records/s, "
+              f"{self.stats['bad_records']:,} malformed)")
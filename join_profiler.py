@@ -0,0 +1,239 @@
+"""
+On-Demand Join Profiler
+=======================
+Sampling CPU profiler plus tracemalloc memory snapshots that can be switched
+on and off while a HybridJoin keeps running, without a restart.
+
+Control (either works):
+- Signal: `kill -USR1 <pid>` toggles profiling (POSIX only)
+- Control socket: a line-based TCP endpoint on localhost accepting
+  "start", "stop", "toggle" and "status", e.g. `echo stop | nc 127.0.0.1 9098`
+
+Every start/stop session writes a directory under the output directory:
+- <thread>.collapsed   sampled stacks per thread in collapsed format
+                       ("outer;...;inner count", flame graph tools read it)
+- <thread>.top.txt     functions by own and by inclusive samples
+- memory_top.txt       top allocation sites at stop, and growth since start
+
+Author: Shahzeb
+Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
+"""
+
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Tuple
+
+# =====================================================
+# CONFIGURATION CONSTANTS
+# =====================================================
+PROFILE_INTERVAL = 0.005      # Seconds between stack samples of all threads
+PROFILE_TOP_N = 30            # Entries per top-N report
+PROFILE_TRACE_FRAMES = 5      # Frames tracemalloc keeps per allocation
+PROFILE_SIGNAL = getattr(signal, 'SIGUSR1', None)  # Toggle signal (None where unsupported)
+PROFILE_CONTROL_HOST = '127.0.0.1'  # Control socket listens locally only
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def safe_name(name: str) -> str:
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+
+
+class ProfileControlHandler(socketserver.StreamRequestHandler):
+    """One command per line; replies with one status line each"""
+
+    def handle(self):
+        profiler: JoinProfiler = self.server.profiler
+        for line in self.rfile:
+            command = line.decode('utf-8', 'replace').strip().lower()
+            if command == 'start':
+                reply = profiler.start()
+            elif command == 'stop':
+                reply = profiler.stop()
+            elif command == 'toggle':
+                reply = profiler.toggle()
+            elif command == 'status':
+                reply = profiler.status()
+            else:
+                reply = f"unknown command {command!r} (start, stop, toggle, status)"
+            self.wfile.write((str(reply) + '\n').encode('utf-8'))
+
+
+class ProfileControlServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class JoinProfiler:
+    """
+    Samples the stacks of all threads every PROFILE_INTERVAL seconds while
+    active and traces allocations with tracemalloc; stop() writes the reports.
+    """
+
+    def __init__(self, output_dir: str, interval: float = PROFILE_INTERVAL, top_n: int = PROFILE_TOP_N,
+                 control_port: Optional[int] = None):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top_n = top_n
+        self.control_port = control_port
+        self.lock = threading.Lock()
+        self.active = False
+        self.sessions = 0
+        self.started_at = 0.0
+        self.sample_count = 0
+        self.samples: Dict[str, Counter] = defaultdict(Counter)   # thread name -> stack -> samples
+        self.sampler: Optional[threading.Thread] = None
+        self.sampler_stop = threading.Event()
+        self.memory_baseline: Optional[tracemalloc.Snapshot] = None
+        self.owns_tracemalloc = False
+        self.control_server: Optional[ProfileControlServer] = None
+
+    # =====================================================
+    # CONTROL
+    # =====================================================
+
+    def install(self):
+        """Register the toggle signal and start the control socket (if a port is set)"""
+        if PROFILE_SIGNAL is not None and threading.current_thread() is threading.main_thread():
+            # Reports are written off the signal handler, which runs in the main thread
+            signal.signal(PROFILE_SIGNAL, lambda signum, frame: threading.Thread(
+                target=self.toggle, name="ProfilerToggle", daemon=True).start())
+            print(f"[Profiler] kill -USR1 {os.getpid()} toggles profiling (reports in {self.output_dir})")
+        if self.control_port is not None:
+            self.control_server = ProfileControlServer((PROFILE_CONTROL_HOST, self.control_port),
+                                                       ProfileControlHandler)
+            self.control_server.profiler = self
+            threading.Thread(target=self.control_server.serve_forever, args=(0.2,),
+                             name="ProfilerControl", daemon=True).start()
+            host, port = self.control_server.server_address
+            print(f"[Profiler] Control socket on {host}:{port} (start, stop, toggle, status)")
+
+    def close(self):
+        """Stop a running session (writing its reports) and the control socket"""
+        self.stop()
+        if self.control_server:
+            self.control_server.shutdown()
+            self.control_server.server_close()
+            self.control_server = None
+        if PROFILE_SIGNAL is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(PROFILE_SIGNAL, signal.SIG_DFL)
+
+    def status(self) -> str:
+        if not self.active:
+            return f"inactive ({self.sessions} sessions written)"
+        return (f"active for {time.time() - self.started_at:.1f}s, {self.sample_count:,} samples "
+                f"of {len(self.samples)} threads")
+
+    def toggle(self) -> str:
+        return self.stop() if self.active else self.start()
+
+    def start(self) -> str:
+        with self.lock:
+            if self.active:
+                return self.status()
+            self.samples = defaultdict(Counter)
+            self.sample_count = 0
+            self.started_at = time.time()
+            self.owns_tracemalloc = not tracemalloc.is_tracing()
+            if self.owns_tracemalloc:
+                tracemalloc.start(PROFILE_TRACE_FRAMES)
+            self.memory_baseline = tracemalloc.take_snapshot()
+            self.sampler_stop.clear()
+            self.sampler = threading.Thread(target=self._sample_loop, name="ProfilerSampler", daemon=True)
+            self.sampler.start()
+            self.active = True
+        print(f"[Profiler] Started (sampling every {self.interval * 1000:.1f} ms, tracemalloc on)")
+        return "started"
+
+    def stop(self) -> str:
+        with self.lock:
+            if not self.active:
+                return "not active"
+            self.sampler_stop.set()
+            self.sampler.join()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if self.owns_tracemalloc:
+                tracemalloc.stop()
+            self.active = False
+            self.sessions += 1
+            path = self.write_reports(snapshot, peak)
+        print(f"[Profiler] Stopped after {self.sample_count:,} samples; reports in {path}")
+        return f"stopped, reports in {path}"
+
+    # =====================================================
+    # SAMPLING
+    # =====================================================
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self.sampler_stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.samples[names.get(ident, f"thread-{ident}")][tuple(reversed(stack))] += 1
+            self.sample_count += 1
+
+    # =====================================================
+    # REPORTS
+    # =====================================================
+
+    def write_reports(self, snapshot: tracemalloc.Snapshot, peak: int = 0) -> str:
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.output_dir, f"session-{self.sessions:03d}-{stamp}")
+        os.makedirs(path, exist_ok=True)
+        elapsed = time.time() - self.started_at
+
+        for thread_name, stacks in self.samples.items():
+            name = safe_name(thread_name)
+            with open(os.path.join(path, f"{name}.collapsed"), 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{';'.join(stack)} {count}\n")
+            own, inclusive = self.function_samples(stacks)
+            total = sum(stacks.values())
+            with open(os.path.join(path, f"{name}.top.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"Thread {thread_name}: {total:,} samples over {elapsed:.1f}s "
+                        f"(every {self.interval * 1000:.1f} ms)\n")
+                for title, counts in (("Own samples (time spent in the function itself)", own),
+                                      ("Inclusive samples (time in the function and its callees)", inclusive)):
+                    f.write(f"\n{title}\n")
+                    for label, count in counts.most_common(self.top_n):
+                        f.write(f"  {count / total:7.2%} {count:>9,}  {label}\n")
+
+        with open(os.path.join(path, 'memory_top.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"Traced allocations at stop: {sum(s.size for s in snapshot.statistics('filename')):,} bytes\n")
+            if peak:
+                f.write(f"Traced peak: {peak:,} bytes\n")
+            f.write(f"\nTop {self.top_n} allocation sites\n")
+            for stat in snapshot.statistics('lineno')[:self.top_n]:
+                f.write(f"  {stat.size:>14,} B {stat.count:>10,} blocks  {stat.traceback[0]}\n")
+            if self.memory_baseline is not None:
+                f.write(f"\nTop {self.top_n} growth since start\n")
+                for stat in snapshot.compare_to(self.memory_baseline, 'lineno')[:self.top_n]:
+                    f.write(f"  {stat.size_diff:>+14,} B {stat.count_diff:>+10,} blocks  {stat.traceback[0]}\n")
+        return path
+
+    @staticmethod
+    def function_samples(stacks: Counter) -> Tuple[Counter, Counter]:
+        """Own (innermost frame) and inclusive (anywhere on the stack) samples per function"""
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in stacks.items():
+            if stack:
+                own[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+        return own, inclusive
@@ -0,0 +1,184 @@
+"""
+Pipeline Metrics Endpoint
+=========================
+Serves the live state of a running HybridJoin over HTTP in the Prometheus
+text exposition format (GET /metrics), so backlog growth can be graphed and
+alerted on while the run is in progress instead of read from the final
+statistics.
+
+Usage:
+    metrics = MetricsServer(join, port=9100)
+    metrics.start()
+    join.run(transaction_file)
+    metrics.stop()
+
+Every scrape reads the join's counters and structures directly; nothing is
+recorded on the join's hot path.
+
+Author: Shahzeb
+Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from hybrid_join import HybridJoin
+
+# =====================================================
+# CONFIGURATION CONSTANTS
+# =====================================================
+METRICS_HOST = '127.0.0.1'    # Local interface only
+METRICS_PORT = 9100
+METRICS_PREFIX = 'hybridjoin_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+COMMIT_QUANTILES = [0.5, 0.9, 0.99]
+
+
+class MetricsWriter:
+    """Builds one exposition: HELP/TYPE headers followed by the samples"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    @staticmethod
+    def _labels(labels: Optional[Dict[str, str]]) -> str:
+        if not labels:
+            return ''
+        pairs = []
+        for name, value in labels.items():
+            value = str(value).replace('\\', r'\\').replace('"', r'\"')
+            pairs.append(f'{name}="{value}"')
+        return '{' + ','.join(pairs) + '}'
+
+    def metric(self, name: str, kind: str, help_text: str, samples: List[Tuple[Optional[Dict], float]]):
+        name = METRICS_PREFIX + name
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self.lines.append(f"{name}{self._labels(labels)} {float(value)!r}")
+
+    def gauge(self, name: str, help_text: str, value: float):
+        self.metric(name, 'gauge', help_text, [(None, value)])
+
+    def counter(self, name: str, help_text: str, value: float):
+        self.metric(name + '_total', 'counter', help_text, [(None, value)])
+
+    def summary(self, name: str, help_text: str, observations: List[float], total: float, count: int):
+        """Quantiles over the (recent) observations, plus _sum and _count over all of them"""
+        name = METRICS_PREFIX + name
+        ordered = sorted(observations)
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} summary")
+        for q in COMMIT_QUANTILES:
+            value = ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float('nan')
+            self.lines.append(f'{name}{{quantile="{q}"}} {float(value)!r}')
+        self.lines.append(f"{name}_sum {float(total)!r}")
+        self.lines.append(f"{name}_count {count}")
+
+    def render(self) -> bytes:
+        return ('\n'.join(self.lines) + '\n').encode('utf-8')
+
+
+def render_metrics(join: HybridJoin) -> bytes:
+    """Prometheus text exposition of the join's current state"""
+    stats = join.stats
+    window = join.window_state()
+    policy = join.commit_policy
+    out = MetricsWriter()
+
+    out.gauge('up', "1 while the join is running, 0 once it is draining or done", 1 if join.running else 0)
+
+    # Backlog and join window
+    out.gauge('stream_buffer_depth', "Tuples waiting in the stream buffer", join.stream_buffer.size())
+    out.gauge('stream_buffer_capacity', "Stream buffer capacity (0 = unbounded)", join.stream_buffer.buffer.maxsize)
+    out.gauge('hash_table_free_slots', "Free join window slots (w)", window['free_slots'])
+    out.gauge('hash_table_entries', "Stream tuples in the hash table", window['hash_entries'])
+    out.gauge('queue_length', "Stream tuples waiting in the join queue", window['queue_length'])
+    out.gauge('oldest_tuple_age_seconds', "Seconds the oldest waiting tuple has been in the join window",
+              window['oldest_tuple_age'])
+    out.gauge('max_tuple_wait_seconds', "Longest wait of a joined tuple so far", stats['max_tuple_wait'])
+    out.gauge('product_retry_pending', "Tuples waiting for a product re-probe after the next master refresh",
+              len(join.product_retry))
+
+    # Throughput
+    out.counter('stream_tuples_received', "Stream tuples read from the source", stats['stream_tuples_received'])
+    out.counter('partitions_loaded', "Disk partitions loaded", stats['partitions_loaded'])
+    out.counter('tuples_joined', "Stream tuples joined and written to the DW", stats['tuples_joined'])
+    out.counter('dw_rows_loaded', "Rows loaded into the DW", stats['tuples_loaded_to_dw'])
+    out.counter('age_forced_loads', "Partition loads forced by the tuple age bound", stats['age_forced_loads'])
+    out.counter('master_refreshes', "Published master data refreshes", stats['master_refreshes'])
+    if join.dedup:
+        out.counter('duplicates_suppressed', "Stream tuples dropped as repeated order_ids", join.dedup.suppressed)
+
+    # Latency mode
+    if join.slo:
+        _, delay_p99, _ = join.slo.percentiles()
+        out.gauge('latency_target_seconds', "End-to-end delay target of the latency mode", join.slo.target)
+        out.gauge('delay_p99_seconds', "p99 end-to-end delay of recently committed rows", delay_p99)
+        out.gauge('latency_knob_level', "Scale of the latency knobs relative to their SLO baseline", join.slo.level)
+        out.counter('slo_violations', "Committed rows whose end-to-end delay exceeded the target", join.slo.violations)
+
+    # DW commits
+    out.counter('dw_commits', "DW group commits", policy.commits)
+    out.gauge('dw_commit_row_target', "Current adaptive rows-per-commit target", policy.row_target)
+    out.gauge('dw_uncommitted_rows', "Rows written to the DW but not committed yet", policy.pending_rows)
+    out.summary('dw_commit_seconds', "DW commit latency (quantiles over recent commits)",
+                list(policy.commit_times), policy.commit_seconds, policy.commits)
+    out.counter('dw_flush_seconds', "Seconds spent ingesting bulk segments ahead of commits",
+                stats['dw_flush_time'])
+
+    # Dead letters
+    with join.dead_letters.lock:
+        counts = dict(join.dead_letters.counts)
+    out.metric('dead_letters_total', 'counter', "Stream tuples routed to the dead-letter sink",
+               [({'reason': reason}, count) for reason, count in sorted(counts.items())])
+
+    # Memory
+    usage = join.memory.usage()
+    out.metric('memory_bytes', 'gauge', "Approximate bytes per join component",
+               [({'component': name}, size) for name, size in usage.items()])
+    if join.memory.budget:
+        out.gauge('memory_budget_bytes', "Memory budget for the join components", join.memory.budget)
+    return out.render()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics; anything else is 404"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics(self.server.join)
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+
+class MetricsServer:
+    """Background HTTP server exposing a HybridJoin's metrics"""
+
+    def __init__(self, join: HybridJoin, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.join = join
+        self.address: Tuple[str, int] = (host, port)
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer(self.address, MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.join = self.join
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, args=(0.2,), name="MetricsServer", daemon=True).start()
+        print(f"[MetricsServer] Serving http://{self.address[0]}:{self.address[1]}/metrics")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
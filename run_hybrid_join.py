@@ -8,7 +8,70 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import the hybrid join module
-from hybrid_join import HybridJoin, MasterDataManager, HASH_TABLE_SLOTS, DISK_PARTITION_SIZE
+from hybrid_join import HybridJoin, MasterDataManager, HASH_TABLE_SLOTS, DISK_PARTITION_SIZE, \
+    detect_memory_limit
+from ingest_server import IngestServer
+from metrics_server import MetricsServer
+
+# Read customer/product master data from MySQL tables instead of the CSVs
+LOAD_MASTER_FROM_DB = False
+
+# JSON-lines file of master data upserts/deletes applied while the join runs
+# (e.g. os.path.join('data', 'master_changes.jsonl')); None disables live refresh
+MASTER_CHANGE_FILE = None
+
+# Share of the container memory limit given to the join hash table
+# (None keeps the fixed HASH_TABLE_SLOTS capacity)
+HASH_TABLE_MEMORY_SHARE = None
+
+# Bytes for all join components together (stream buffer, join window, master data, ...);
+# over it the producer is throttled and admission into the join window is cut back
+# (None only accounts usage)
+MEMORY_BUDGET = None
+
+# 'insert' loads joined rows with INSERT statements, 'bulk' with LOAD DATA LOCAL INFILE
+# segments (falls back to batched INSERTs when local_infile is disabled)
+DW_SINK = 'insert'
+
+# 'immediate' keeps the secondary indexes maintained on every insert, 'deferred' loads
+# an empty DW table bare and builds them once at the end (a table that already holds
+# data is never left unindexed), 'none' never builds them
+DW_INDEX_MODE = 'immediate'
+
+# Stream transactions from this MySQL table instead of transactional_data.csv
+# (e.g. 'transactional_data')
+SOURCE_TABLE = None
+
+# Keep following the source: poll the table for newly inserted rows, or tail the
+# transaction file as it grows ('tail -f'); TRANSACTION_PATH may also name a
+# directory of rotating CSV files, read in name order
+FOLLOW_SOURCE = False
+TRANSACTION_PATH = None
+
+# Accept transactions pushed over TCP on this local port instead (run until Ctrl+C;
+# drive it with run_ingest_loadgen.py)
+INGEST_PORT = None
+
+# Profile the live run on demand: `kill -USR1 <pid>` (or "toggle" sent to the control
+# port, if set) starts/stops sampling + tracemalloc; reports go to data/profiles
+PROFILING = False
+PROFILE_CONTROL_PORT = None
+
+# Serve live pipeline metrics in Prometheus text format at http://127.0.0.1:<port>/metrics
+# (e.g. 9100); None disables the endpoint
+METRICS_PORT = None
+
+# Latency mode: hold the p99 end-to-end delay (arrival -> DW commit) under this many
+# seconds by tuning partition choice, batch sizes and commits; None favors throughput
+LATENCY_TARGET = None
+
+# Drop repeated order_ids (upstream replays/retries) before they enter the join; costs
+# a Bloom filter probe per tuple and ~12 MB, so enable it for sources that may replay
+DEDUP = False
+
+# Maintain rolling revenue by store, supplier, category and city while joining
+# (hybrid_join.aggregates API; creates and fills DW_WINDOW_AGGREGATES, see stream_aggregates.py)
+WINDOW_AGGREGATES = False
 
 def main():
     print("\n" + "=" * 70)
@@ -34,10 +97,14 @@ def main():
     
     customer_file = os.path.join(data_folder, 'customer_master_data.csv')
     product_file = os.path.join(data_folder, 'product_master_data.csv')
-    transaction_file = os.path.join(data_folder, 'transactional_data.csv')
+    transaction_file = TRANSACTION_PATH or os.path.join(data_folder, 'transactional_data.csv')
+    snapshot_file = os.path.join(data_folder, 'master_data.snapshot')
     
     # Verify files exist
-    for f in [customer_file, product_file, transaction_file]:
+    required_files = [] if SOURCE_TABLE or INGEST_PORT else [transaction_file]
+    if not LOAD_MASTER_FROM_DB:
+        required_files += [customer_file, product_file]
+    for f in required_files:
         if not os.path.exists(f):
             print(f"Error: File not found: {f}")
             return
@@ -45,11 +112,46 @@ def main():
     print("\n[Main] Loading master data...")
     
     # Load master data
-    master_data = MasterDataManager(customer_file, product_file)
+    if LOAD_MASTER_FROM_DB:
+        master_data = MasterDataManager(db_config=db_config)
+    else:
+        master_data = MasterDataManager(customer_file, product_file, snapshot_path=snapshot_file)
+    
+    # Create and run HYBRIDJOIN (resumes automatically if a checkpoint exists)
+    checkpoint_file = os.path.join(data_folder, 'hybrid_join_checkpoint.json')
+    dead_letter_file = os.path.join(data_folder, 'hybrid_join_dead_letter.jsonl')
+    profile_dir = os.path.join(data_folder, 'profiles') if PROFILING else None
+    hash_memory_budget = None
+    memory_limit = detect_memory_limit()
+    if HASH_TABLE_MEMORY_SHARE and memory_limit:
+        hash_memory_budget = int(memory_limit * HASH_TABLE_MEMORY_SHARE)
+        print(f"[Main] Hash table memory budget: {hash_memory_budget:,} bytes")
     
-    # Create and run HYBRIDJOIN
-    hybrid_join = HybridJoin(db_config, master_data)
-    hybrid_join.run(transaction_file)
+    hybrid_join = HybridJoin(db_config, master_data, checkpoint_path=checkpoint_file,
+                             master_change_file=MASTER_CHANGE_FILE,
+                             hash_memory_budget=hash_memory_budget,
+                             memory_budget=MEMORY_BUDGET,
+                             dw_sink=DW_SINK,
+                             index_mode=DW_INDEX_MODE,
+                             source_table=SOURCE_TABLE,
+                             follow_source=FOLLOW_SOURCE,
+                             dead_letter_path=dead_letter_file,
+                             profile_dir=profile_dir,
+                             profile_port=PROFILE_CONTROL_PORT,
+                             latency_target=LATENCY_TARGET,
+                             dedup=DEDUP,
+                             window_aggregates=WINDOW_AGGREGATES)
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = MetricsServer(hybrid_join, port=METRICS_PORT)
+        metrics_server.start()
+    if INGEST_PORT:
+        ingest_server = IngestServer(hybrid_join, port=INGEST_PORT)
+        hybrid_join.run(producer=ingest_server.serve)
+    else:
+        hybrid_join.run(transaction_file)
+    if metrics_server:
+        metrics_server.stop()
     
     print("\n[Main] HYBRIDJOIN execution completed!")
 
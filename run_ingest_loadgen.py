@@ -0,0 +1,95 @@
+"""
+Load generator for the HYBRIDJOIN ingest server
+Opens many concurrent connections to a running ingest server (see
+INGEST_PORT in run_hybrid_join.py) and pushes synthetic transactions drawn
+from the real master data, then reports the achieved send throughput.
+Because the server applies backpressure, the rate measured here is the
+rate the join pipeline accepted (up to what the socket buffers hold).
+
+Usage: python run_ingest_loadgen.py [connections] [records_per_connection] [lines|frames|records] [port]
+"""
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from typing import List
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hybrid_join import MasterDataManager
+from ingest_server import INGEST_HOST, INGEST_PORT, FRAME_MAGIC, RECORD_FRAME_MAGIC, FRAME_HEADER
+from stream_records import encode_columns
+
+RECORDS_PER_SEND = 500        # Records per socket write (and per frame in frames/records mode)
+
+
+def make_chunks(customer_ids, product_ids, count: int, first_order_id: int, seed: int, mode: str) -> List[bytes]:
+    """Byte chunks of one connection ('count' records, consecutive order IDs) in the given wire format"""
+    rng = random.Random(seed)
+    rows = [(first_order_id + i, rng.choice(customer_ids), rng.choice(product_ids), rng.randint(1, 5), '2017-07-01')
+            for i in range(count)]
+    chunks = [FRAME_MAGIC] if mode == 'frames' else [RECORD_FRAME_MAGIC] if mode == 'records' else []
+    for i in range(0, count, RECORDS_PER_SEND):
+        batch = rows[i:i + RECORDS_PER_SEND]
+        if mode == 'records':
+            payload = encode_columns(*zip(*batch))
+        else:
+            payload = ''.join(f"{o},{c},{p},{q},{d}\n" for o, c, p, q, d in batch).encode('utf-8')
+        chunks.append(payload if mode == 'lines' else FRAME_HEADER.pack(len(payload)) + payload)
+    return chunks
+
+
+def client(address, chunks: List[bytes], results: list, index: int):
+    """Send one connection's chunks"""
+    start = time.time()
+    with socket.create_connection(address) as sock:
+        for chunk in chunks:
+            sock.sendall(chunk)
+    results[index] = time.time() - start
+
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_connection = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    mode = sys.argv[3] if len(sys.argv) > 3 else 'lines'
+    port = int(sys.argv[4]) if len(sys.argv) > 4 else INGEST_PORT
+
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    data_folder = os.path.join(base_path, 'data')
+    master_data = MasterDataManager(os.path.join(data_folder, 'customer_master_data.csv'),
+                                    os.path.join(data_folder, 'product_master_data.csv'))
+    customer_ids = list(master_data.current_version().customer_ids())
+    product_ids = list(master_data.current_version().product_ids())
+
+    print("\n" + "=" * 70)
+    print(f"   INGEST LOAD GENERATOR - {connections} CONNECTIONS x {per_connection:,} RECORDS ({mode})")
+    print("=" * 70)
+
+    # Build payloads up front so only sending is timed
+    payloads = [make_chunks(customer_ids, product_ids, per_connection, 1_000_000 + i * per_connection, i, mode)
+                for i in range(connections)]
+    results = [0.0] * connections
+    threads = [threading.Thread(target=client, args=((INGEST_HOST, port), payloads[i], results, i))
+               for i in range(connections)]
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    total = connections * per_connection
+    total_bytes = sum(len(chunk) for chunks in payloads for chunk in chunks)
+    print(f"  Records sent:       {total:,}")
+    print(f"  Elapsed:            {elapsed:.2f} seconds")
+    print(f"  Throughput:         {total / elapsed:,.0f} records/s ({total_bytes / elapsed / 1e6:,.1f} MB/s)")
+    print(f"  Slowest connection: {max(results):.2f} seconds")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
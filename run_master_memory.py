@@ -0,0 +1,82 @@
+"""
+Master data memory benchmark: dict-of-dicts vs columnar MasterDataManager
+Synthesizes a large customer master file (default 1,000,000 customers) from
+the real one and reports memory per customer record for both representations.
+
+Usage: python run_master_memory.py [num_customers]
+"""
+import csv
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hybrid_join import MasterDataManager
+
+
+def write_synthetic_customers(source_file: str, target_file: str, count: int):
+    """Repeat real customer rows with fresh Customer_IDs until 'count' rows exist"""
+    with open(source_file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    id_col = header.index('Customer_ID')
+
+    with open(target_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(count):
+            row = list(rows[i % len(rows)])
+            row[0] = i
+            row[id_col] = 1000001 + i
+            writer.writerow(row)
+
+
+def measure(customer_file: str, product_file: str, columnar: bool) -> int:
+    """Bytes held by the customer relation after loading"""
+    gc.collect()
+    tracemalloc.start()
+    master_data = MasterDataManager(customer_file, product_file, columnar=columnar)
+    del master_data.product_data, master_data.product_ids
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    data_folder = os.path.join(base_path, 'data')
+    customer_file = os.path.join(data_folder, 'customer_master_data.csv')
+    product_file = os.path.join(data_folder, 'product_master_data.csv')
+
+    print("\n" + "=" * 70)
+    print(f"   MASTER DATA MEMORY - {count:,} CUSTOMERS")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic_file = os.path.join(tmp, 'customers.csv')
+        write_synthetic_customers(customer_file, synthetic_file, count)
+
+        results = {}
+        for columnar in (False, True):
+            results[columnar] = measure(synthetic_file, product_file, columnar)
+
+    print("\n" + "=" * 70)
+    print(f"{'Representation':<20} {'Total MB':>12} {'Bytes/record':>15}")
+    print(f"{'-' * 20} {'-' * 12} {'-' * 15}")
+    for columnar, used in results.items():
+        label = 'columnar' if columnar else 'dict-of-dicts'
+        print(f"{label:<20} {used / 1e6:>12,.1f} {used / count:>15,.1f}")
+    print(f"\nReduction: {results[False] / max(results[True], 1):.1f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
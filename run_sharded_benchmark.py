@@ -0,0 +1,107 @@
+"""
+Scaling benchmark for the sharded HYBRIDJOIN consumer pool
+Joins a synthetic transaction stream (default 100,000 tuples drawn from the
+real master data) with 1, 2, 4 and 8 consumers and reports throughput and
+speedup. No database is needed: the DW sink is skipped. The stream is
+buffered completely before the clock starts, so only the join is timed.
+
+Each partition load sleeps for a simulated disk read (default 2 ms), which
+is the I/O the consumers can overlap. With free-threaded Python the CPU part
+of the join scales as well; with the GIL mostly the I/O part does.
+
+Usage: python run_sharded_benchmark.py [num_transactions] [partition_read_ms]
+"""
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import hybrid_join
+from hybrid_join import MasterDataManager, StreamBuffer
+from sharded_join import ShardedHybridJoin
+
+CONSUMER_COUNTS = [1, 2, 4, 8]
+
+
+class DiskLatencyJoin(ShardedHybridJoin):
+    """ShardedHybridJoin whose partition loads take a simulated disk read time"""
+    def __init__(self, *args, read_latency: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_latency = read_latency
+
+    def choose_page(self, shard, master, oldest_key):
+        time.sleep(self.read_latency)
+        return super().choose_page(shard, master, oldest_key)
+
+
+def write_synthetic_transactions(master_data: MasterDataManager, target_file: str, count: int):
+    """Random transactions over existing customers and products"""
+    rng = random.Random(42)
+    customer_ids = list(master_data.current_version().customer_ids())
+    product_ids = list(master_data.current_version().product_ids())
+    with open(target_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['', 'orderID', 'Customer_ID', 'Product_ID', 'quantity', 'date'])
+        for i in range(count):
+            writer.writerow([i, 100000 + i, rng.choice(customer_ids), rng.choice(product_ids),
+                             rng.randint(1, 5), '2017-07-01'])
+
+
+def measure(master_data: MasterDataManager, transaction_file: str, consumers: int, read_latency: float):
+    """Join the whole file with 'consumers' threads; returns (seconds, tuples joined, partitions loaded)"""
+    join = DiskLatencyJoin({}, master_data, consumers=consumers, read_latency=read_latency)
+    join.stream_buffer = StreamBuffer(max_size=0)
+    join.running = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        join.stream_producer(transaction_file)
+        join.running = False
+        start = time.time()
+        join.join_consumer()
+        elapsed = time.time() - start
+    return elapsed, join.stats['tuples_joined'], join.stats['partitions_loaded']
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    read_latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    data_folder = os.path.join(base_path, 'data')
+    customer_file = os.path.join(data_folder, 'customer_master_data.csv')
+    product_file = os.path.join(data_folder, 'product_master_data.csv')
+
+    print("\n" + "=" * 70)
+    print(f"   SHARDED HYBRIDJOIN SCALING - {count:,} TUPLES, {read_latency * 1000:.1f} MS PER PARTITION")
+    print("=" * 70)
+
+    # Stream as fast as the join can consume
+    hybrid_join.STREAM_DELAY = 0
+    master_data = MasterDataManager(customer_file, product_file)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        transaction_file = os.path.join(tmp, 'transactions.csv')
+        write_synthetic_transactions(master_data, transaction_file, count)
+        for consumers in CONSUMER_COUNTS:
+            results[consumers] = measure(master_data, transaction_file, consumers, read_latency)
+            print(f"[Benchmark] {consumers} consumers done in {results[consumers][0]:.2f}s")
+
+    print("\n" + "=" * 70)
+    print(f"{'Consumers':<10} {'Seconds':>10} {'Tuples/s':>12} {'Partitions':>12} {'Speedup':>10}")
+    print(f"{'-' * 10} {'-' * 10} {'-' * 12} {'-' * 12} {'-' * 10}")
+    baseline = results[CONSUMER_COUNTS[0]][0]
+    for consumers, (elapsed, joined, partitions) in results.items():
+        print(f"{consumers:<10} {elapsed:>10.2f} {joined / elapsed:>12,.0f} {partitions:>12,} "
+              f"{baseline / elapsed:>9.2f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
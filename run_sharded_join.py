@@ -0,0 +1,64 @@
+"""
+Quick runner for the sharded HYBRIDJOIN engine (pool of join consumers)
+"""
+import os
+import sys
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Import the hybrid join modules
+from hybrid_join import MasterDataManager
+from sharded_join import ShardedHybridJoin, JOIN_CONSUMERS, JOIN_SHARDS
+
+# Bytes for all join components together; caps the tuples routed to the shards
+# and throttles the producer when exceeded (None only accounts usage)
+MEMORY_BUDGET = None
+
+def main():
+    print("\n" + "=" * 70)
+    print("   SHARDED HYBRIDJOIN - QUICK RUN")
+    print("=" * 70)
+    
+    # Preset credentials
+    db_config = {
+        'host': 'localhost',
+        'port': 3306,
+        'user': 'root',
+        'password': '1234',
+        'database': 'project_test'
+    }
+    
+    print(f"\nUsing database: {db_config['database']} @ {db_config['host']}")
+    print(f"Join Consumers: {JOIN_CONSUMERS}, Shards: {JOIN_SHARDS}")
+    
+    # File paths
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    data_folder = os.path.join(base_path, 'data')
+    
+    customer_file = os.path.join(data_folder, 'customer_master_data.csv')
+    product_file = os.path.join(data_folder, 'product_master_data.csv')
+    transaction_file = os.path.join(data_folder, 'transactional_data.csv')
+    snapshot_file = os.path.join(data_folder, 'master_data.snapshot')
+    
+    # Verify files exist
+    for f in [customer_file, product_file, transaction_file]:
+        if not os.path.exists(f):
+            print(f"Error: File not found: {f}")
+            return
+    
+    print("\n[Main] Loading master data...")
+    
+    # Load master data
+    master_data = MasterDataManager(customer_file, product_file, snapshot_path=snapshot_file)
+    
+    # Create and run the sharded engine (resumes automatically if a checkpoint exists)
+    checkpoint_file = os.path.join(data_folder, 'hybrid_join_checkpoint.json')
+    hybrid_join = ShardedHybridJoin(db_config, master_data, checkpoint_path=checkpoint_file,
+                                    memory_budget=MEMORY_BUDGET)
+    hybrid_join.run(transaction_file)
+    
+    print("\n[Main] Sharded HYBRIDJOIN execution completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Sharded HYBRIDJOIN Engine
+=========================
+Several join consumer threads in one process.
+
+The join window is split into shards by master data page (page % shards).
+Every shard has its own lock, inbox of routed stream tuples, hash table,
+queue, partition histogram and oldest key. A shard only ever holds tuples
+whose customer key lies on one of its own pages, so the partitions it loads
+and the entries it probes are disjoint from every other shard's, and the
+consumers of the pool (each owning a disjoint set of shards) do not contend.
+
+Shared between consumers are only the stream buffer (routing), the DW
+writer and group commits. A commit quiesces every shard first, so the
+checkpoint still captures a consistent join window.
+
+Lock order: route_lock -> shard locks (by index) -> dw_lock.
+
+Author: Shahzeb
+Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from hybrid_join import HybridJoin, MasterDataManager, MasterDataVersion, DoublyLinkedQueue, HashTable, \
+    PartitionHistogram, DW_COLUMNS, HASH_TABLE_SLOTS, HASH_ENTRY_OVERHEAD_BYTES, QUEUE_NODE_BYTES, STREAM_BATCH_SIZE
+
+# =====================================================
+# CONFIGURATION CONSTANTS
+# =====================================================
+JOIN_SHARDS = 16              # Join window shards (master pages are assigned page % JOIN_SHARDS)
+JOIN_CONSUMERS = 4            # Consumer threads in the pool
+
+
+# =====================================================
+# JOIN SHARD
+# =====================================================
+
+class JoinShard:
+    """One slice of the join window, guarded by its own lock"""
+    def __init__(self, index: int, num_slots: int, memory_budget: Optional[int] = None):
+        self.index = index
+        self.lock = threading.Lock()
+        self.inbox = deque()            # Routed tuples waiting for admission (deque appends are thread-safe)
+        self.hash_table = HashTable(num_slots, memory_budget=memory_budget)
+        self.queue = DoublyLinkedQueue()
+        self.histogram = PartitionHistogram()
+        self.histogram_version: Optional[int] = None
+        self.partition: List[Dict] = []  # Partition loaded by the last iteration (the shard's disk buffer)
+
+    def has_work(self) -> bool:
+        return bool(self.inbox) or not self.queue.is_empty()
+
+
+# =====================================================
+# SHARDED HYBRIDJOIN
+# =====================================================
+
+class ShardedHybridJoin(HybridJoin):
+    """
+    HybridJoin with a pool of join consumers over a sharded join window.
+    Reuses the stream producer, DW sink, commit policy, checkpointing and
+    statistics of HybridJoin; only the join step is replaced.
+    """
+
+    def __init__(self, db_config: Dict, master_data: MasterDataManager,
+                 checkpoint_path: Optional[str] = None, consumers: int = JOIN_CONSUMERS,
+                 shards: int = JOIN_SHARDS, **kwargs):
+        super().__init__(db_config, master_data, checkpoint_path=checkpoint_path, **kwargs)
+        self.consumers = max(1, consumers)
+        shards = max(shards, self.consumers)
+        budget = self.hash_table.memory_budget
+        self.shards = [JoinShard(i, max(HASH_TABLE_SLOTS // shards, 1), budget // shards if budget else None)
+                       for i in range(shards)]
+        self.route_lock = threading.Lock()
+        self.dw_lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+
+        # The global hash table, queue and disk buffer stay empty; account the shards instead
+        self.memory.register('stream_buffer', lambda: self.stream_buffer.approx_bytes() +
+                             self.stream_buffer.tuple_bytes * sum(len(s.inbox) for s in self.shards))
+        self.memory.register('hash_table', lambda: sum(s.hash_table.memory_used() for s in self.shards))
+        self.memory.register('queue', lambda: sum(s.queue.approx_bytes() for s in self.shards))
+        self.memory.register('disk_buffer', lambda: sum(self.partition_bytes(s.partition) for s in self.shards))
+        self.stats['consumer_iterations'] = [0] * self.consumers
+
+    def shard_of(self, master: MasterDataVersion, customer_id: int) -> JoinShard:
+        return self.shards[master.page_of(customer_id) % len(self.shards)]
+
+    def admit_tuple(self, tuple_data: Dict, master: MasterDataVersion):
+        """Route a stream tuple to its shard's inbox (admitted by the shard's consumer)"""
+        if not master.has_customer(tuple_data['customer_id']):
+            self.dead_letters.write(tuple_data, 'orphan_customer')
+            return
+        self.shard_of(master, tuple_data['customer_id']).inbox.append(tuple_data)
+
+    def in_flight_tuples(self) -> List[Dict]:
+        tuples = []
+        for shard in self.shards:
+            tuples.extend(shard.queue.snapshot())
+            tuples.extend(shard.inbox)
+        tuples.extend(self.product_retry.snapshot())
+        return tuples
+
+    def window_state(self) -> Dict[str, float]:
+        return {
+            'free_slots': sum(shard.hash_table.available_slots() for shard in self.shards),
+            'hash_entries': sum(shard.hash_table.total_entries for shard in self.shards),
+            'queue_length': sum(len(shard.queue) + len(shard.inbox) for shard in self.shards),
+            'oldest_tuple_age': max(shard.queue.peek_oldest_age() for shard in self.shards)
+        }
+
+    def retry_unknown_products(self, final: bool = False):
+        """Re-probe deferred tuples under the DW lock (only when some are due)"""
+        if final or self.product_retry.ready(self.refresh_polls):
+            with self.dw_lock:
+                super().retry_unknown_products(final)
+
+    def route_stream(self):
+        """
+        Move buffered stream tuples into the shard inboxes: up to one window
+        of backlog, and under a memory budget no more than the join window
+        can still take in (routed tuples are admitted by the shards next)
+        """
+        with self.route_lock:
+            # Read under the lock: routing never goes back to a version older
+            # than the one whose deletes were already evicted
+            master = self.master_data.current_version()
+            self.evict_orphans(master)
+            backlog = sum(len(shard.inbox) for shard in self.shards)
+            limit = HASH_TABLE_SLOTS - backlog
+            allowance = self.memory.admission_allowance(
+                HASH_ENTRY_OVERHEAD_BYTES + QUEUE_NODE_BYTES,
+                minimum=0 if any(shard.has_work() for shard in self.shards) else STREAM_BATCH_SIZE)
+            if allowance is not None and allowance - backlog < limit:
+                limit = allowance - backlog
+                self.memory.admission_limited += 1
+            if limit <= 0:
+                return
+            stream_tuples = self.stream_buffer.get_batch(limit)
+            for tuple_data in stream_tuples:
+                self.admit_tuple(tuple_data, master)
+            if stream_tuples:
+                self.admitted_offset = stream_tuples[-1].get('_offset', self.admitted_offset)
+                self.admitted_count += len(stream_tuples)
+
+    def evict_orphans(self, master: MasterDataVersion):
+        """
+        Dead-letter routed or waiting tuples whose customer a refresh deleted
+        (caller holds route_lock; only the shards owning deleted keys are locked)
+        """
+        deleted_by_shard: Dict[int, set] = {}
+        for customer_id in self.master_data.take_deleted_customers(master.number):
+            if not master.has_customer(customer_id):
+                deleted_by_shard.setdefault(self.shard_of(master, customer_id).index, set()).add(customer_id)
+        for index, deleted in sorted(deleted_by_shard.items()):
+            shard = self.shards[index]
+            with shard.lock:
+                for customer_id in deleted:
+                    for data, node in shard.hash_table.lookup(customer_id):
+                        shard.hash_table.remove(customer_id, node)
+                        shard.queue.remove_node(node)
+                        shard.histogram.remove(master.page_of(customer_id))
+                        self.dead_letters.write(data, 'orphan_customer')
+                routed = [tuple_data for tuple_data in shard.inbox if tuple_data['customer_id'] in deleted]
+                if routed:
+                    shard.inbox = deque(tuple_data for tuple_data in shard.inbox
+                                        if tuple_data['customer_id'] not in deleted)
+                    for tuple_data in routed:
+                        self.dead_letters.write(tuple_data, 'orphan_customer')
+
+    def choose_page(self, shard: JoinShard, master: MasterDataVersion, oldest_key: int) -> Tuple[int, bool]:
+        """
+        Page the shard loads next, and whether the age bound forced it.
+        The oldest key's page under 'oldest'; under 'benefit' the shard's
+        page with the most matchable waiting tuples, within max_tuple_wait.
+        """
+        page = master.page_of(oldest_key)
+        if self.partition_policy != 'benefit':
+            return page, False
+        if master.number != shard.histogram_version:
+            shard.histogram.reset_unmatchable()
+            shard.histogram_version = master.number
+        if shard.queue.peek_oldest_age() > self.max_tuple_wait and shard.histogram.benefit(page) > 0:
+            return page, True
+        best = shard.histogram.best_page()
+        return (page if best is None else best), False
+
+    def process_shard(self, shard: JoinShard, master: MasterDataVersion):
+        """One HYBRIDJOIN iteration on a shard (caller holds shard.lock)"""
+        # STEP 1: Admit routed tuples up to the shard's free slots
+        slots = shard.hash_table.available_slots()
+        while slots > 0 and shard.inbox:
+            tuple_data = shard.inbox.popleft()
+            join_key = tuple_data['customer_id']
+            queue_node = shard.queue.enqueue(join_key, tuple_data)
+            shard.hash_table.insert(join_key, tuple_data, queue_node)
+            shard.histogram.add(master.page_of(join_key))
+            slots -= 1
+
+        # STEP 2: Load one of the shard's own partitions
+        oldest_key = shard.queue.peek_oldest_key()
+        if oldest_key is None:
+            return
+        page, forced = self.choose_page(shard, master, oldest_key)
+        partition = shard.partition = master.get_page(page)
+        now = time.time()
+
+        # STEP 3-5: Probe, enrich, remove matched tuples
+        rows = []
+        arrivals = []
+        max_wait = 0.0
+        for customer_data in partition:
+            customer_id = customer_data['Customer_ID']
+            for stream_tuple, queue_node in shard.hash_table.lookup(customer_id):
+                product_data = master.get_product(stream_tuple['product_id'])
+                if product_data:
+                    enriched_tuple = self.enrich_tuple(stream_tuple, customer_id, customer_data, product_data)
+                    rows.append(tuple(enriched_tuple.get(column) for column in DW_COLUMNS))
+                    arrivals.append(stream_tuple.get('_arrived'))
+                else:
+                    self.defer_unknown_product(stream_tuple)
+                shard.hash_table.remove(customer_id, queue_node)
+                shard.queue.remove_node(queue_node)
+                shard.histogram.remove(page)
+                max_wait = max(max_wait, now - queue_node.enqueued_at)
+        shard.histogram.mark_loaded(page)
+
+        # The DW connection and statistics are shared by the pool
+        with self.dw_lock:
+            self.load_batch_to_dw(rows)
+            if self.slo:
+                for arrived in arrivals:
+                    self.slo.record(arrived)
+            self.stats['tuples_joined'] += len(rows)
+            self.stats['partitions_loaded'] += 1
+            self.stats['age_forced_loads'] += forced
+            self.stats['max_tuple_wait'] = max(self.stats['max_tuple_wait'], max_wait)
+
+    def commit_dw(self, reason: str = 'final'):
+        """Commit with routing stopped and every shard quiesced, so the checkpoint is consistent"""
+        with self.route_lock:
+            for shard in self.shards:
+                shard.lock.acquire()
+            try:
+                with self.dw_lock:
+                    super().commit_dw(reason)
+            finally:
+                for shard in self.shards:
+                    shard.lock.release()
+
+    def consumer_worker(self, worker: int):
+        """Consumer thread of the pool: joins the shards with index % consumers == worker"""
+        owned = self.shards[worker::self.consumers]
+        while True:
+            self.route_stream()
+            master = self.master_data.current_version()
+
+            worked = False
+            for shard in owned:
+                with shard.lock:
+                    if shard.has_work():
+                        self.process_shard(shard, master)
+                        worked = True
+            self.retry_unknown_products()
+            self.stats['consumer_iterations'][worker] += 1
+
+            # Group commit; one consumer commits, the others keep joining
+            reason = self.commit_policy.due()
+            if reason and self.commit_lock.acquire(blocking=False):
+                try:
+                    self.commit_dw(reason)
+                finally:
+                    self.commit_lock.release()
+
+            if not worked:
+                # Routing happens under route_lock, so nothing can reach
+                # an owned shard after this check
+                with self.route_lock:
+                    if self.stream_buffer.is_finished() and not any(shard.has_work() for shard in owned):
+                        break
+                time.sleep(0.01)  # Wait for more data
+
+    def join_consumer(self):
+        """
+        THREAD 2: Consumer pool
+        Runs 'consumers' worker threads over disjoint shards and waits for them.
+        """
+        print(f"[ShardedJoin] Starting {self.consumers} join consumers over {len(self.shards)} shards...")
+
+        workers = [threading.Thread(target=self.consumer_worker, args=(i,), name=f"JoinConsumer-{i}")
+                   for i in range(self.consumers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Last re-probe of deferred tuples, then final commit
+        self.retry_unknown_products(final=True)
+        self.commit_dw()
+
+        print("[ShardedJoin] Join completed!")
+        print(f"[ShardedJoin] Total joined: {self.stats['tuples_joined']} "
+              f"(iterations per consumer: {self.stats['consumer_iterations']})")
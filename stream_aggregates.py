@@ -0,0 +1,260 @@
+"""
+In-Stream Windowed Aggregates
+=============================
+Rolling revenue, quantity and transaction counts per store, supplier,
+product category and city category, maintained by the join as enriched
+rows are loaded into the DW, so dashboards need not re-scan
+DW_ENRICHED_TRANSACTIONS. Rows whose insert fails are not counted; with the
+bulk sink, rows are counted when their segment is ingested (in the pane of
+the time they were emitted).
+
+Windows run on processing time (when the join emitted the row): the stream
+only carries an order date, which is far coarser than the windows.
+
+Rows are added to fixed panes of AGG_PANE_SECONDS. A tumbling window of
+size W (a multiple of the pane) is the sum of the W / pane panes of its
+aligned slot; a sliding window of size S is the sum of the most recent
+S / pane panes (including the pane in progress). Panes older than the
+largest window are dropped.
+
+Reading:
+- API: WindowedAggregates.tumbling() / sliding() / top()
+- SQL: closed tumbling windows are appended to DW_WINDOW_AGGREGATES and
+  the sliding windows in it are replaced by their current state, every
+  AGG_FLUSH_INTERVAL seconds within a DW commit (see HybridJoin.commit_dw)
+
+Author: Shahzeb
+Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
+"""
+
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# =====================================================
+# CONFIGURATION CONSTANTS
+# =====================================================
+AGG_PANE_SECONDS = 10         # Granularity of all windows
+AGG_TUMBLING_WINDOWS = [60, 300]  # Tumbling window sizes (seconds, multiples of the pane)
+AGG_SLIDING_WINDOWS = [300, 900]  # Sliding window sizes (seconds, multiples of the pane)
+AGG_FLUSH_INTERVAL = 10.0     # Seconds between flushes to DW_WINDOW_AGGREGATES
+AGG_DIMENSIONS = {            # Dimension name -> DW column it groups by
+    'store': 'store_name',
+    'supplier': 'supplier_name',
+    'product_category': 'product_category',
+    'city': 'city_category'
+}
+
+# One row per window, dimension and key (sliding windows only hold their latest state)
+AGG_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS DW_WINDOW_AGGREGATES (
+    window_kind VARCHAR(10),
+    window_seconds INT,
+    window_start DATETIME,
+    window_end DATETIME,
+    dimension VARCHAR(20),
+    dim_key VARCHAR(100),
+    revenue DECIMAL(16,2),
+    quantity BIGINT,
+    transactions BIGINT,
+    PRIMARY KEY (window_kind, window_seconds, dimension, dim_key, window_start)
+)
+"""
+AGG_CLEAR_SLIDING_SQL = "DELETE FROM DW_WINDOW_AGGREGATES WHERE window_kind = 'sliding'"
+AGG_UPSERT_SQL = (
+    "INSERT INTO DW_WINDOW_AGGREGATES (window_kind, window_seconds, window_start, window_end, "
+    "dimension, dim_key, revenue, quantity, transactions) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE window_end = VALUES(window_end), revenue = VALUES(revenue), "
+    "quantity = VALUES(quantity), transactions = VALUES(transactions)"
+)
+
+# Totals per key: [revenue, quantity, transactions]
+Totals = Dict[str, List[float]]
+
+
+def _merge(target: Totals, source: Totals):
+    for key, (revenue, quantity, count) in source.items():
+        totals = target.get(key)
+        if totals is None:
+            target[key] = [revenue, quantity, count]
+        else:
+            totals[0] += revenue
+            totals[1] += quantity
+            totals[2] += count
+
+
+def _timestamp(seconds: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds))
+
+
+class WindowedAggregates:
+    """Pane-based tumbling and sliding window aggregates over emitted DW rows"""
+
+    def __init__(self, columns: Sequence[str], pane_seconds: int = AGG_PANE_SECONDS,
+                 tumbling: Sequence[int] = AGG_TUMBLING_WINDOWS, sliding: Sequence[int] = AGG_SLIDING_WINDOWS,
+                 dimensions: Optional[Dict[str, str]] = None):
+        for size in list(tumbling) + list(sliding):
+            if size % pane_seconds:
+                raise ValueError(f"window of {size}s is not a multiple of the {pane_seconds}s pane")
+        self.pane_seconds = pane_seconds
+        self.tumbling_sizes = list(tumbling)
+        self.sliding_sizes = list(sliding)
+        self.dimensions = dict(dimensions or AGG_DIMENSIONS)
+        # Positions of the grouping, revenue and quantity columns in a DW row
+        self.key_positions = [(name, columns.index(column)) for name, column in self.dimensions.items()]
+        self.revenue_position = columns.index('total_amount')
+        self.quantity_position = columns.index('quantity')
+        self.retention_panes = max(self.tumbling_sizes + self.sliding_sizes + [pane_seconds]) // pane_seconds + 1
+
+        self.lock = threading.Lock()
+        self.panes: Dict[int, Dict[str, Totals]] = {}   # pane index -> dimension -> key -> totals
+        self.totals: Dict[str, Totals] = {name: {} for name in self.dimensions}   # Every row of the run
+        self.pending: Dict[str, Totals] = {name: {} for name in self.dimensions}  # Rows not committed yet
+        self.rows = 0
+        self.flushed_until = {size: None for size in self.tumbling_sizes}  # First pane not flushed yet
+        self.last_flush = time.time()
+        self.flushes = 0
+
+    def pane_of(self, now: float) -> int:
+        return int(now // self.pane_seconds)
+
+    # =====================================================
+    # UPDATES (join consumer)
+    # =====================================================
+
+    def add_rows(self, rows: List[Tuple], now: Optional[float] = None):
+        """Account DW value rows (DW_COLUMNS order) emitted at 'now'"""
+        if not rows:
+            return
+        pane_index = self.pane_of(time.time() if now is None else now)
+        with self.lock:
+            pane = self.panes.get(pane_index)
+            if pane is None:
+                pane = self.panes[pane_index] = {name: {} for name in self.dimensions}
+                self._expire(pane_index)
+            revenue_position = self.revenue_position
+            quantity_position = self.quantity_position
+            for row in rows:
+                revenue = float(row[revenue_position] or 0)
+                quantity = row[quantity_position] or 0
+                for name, position in self.key_positions:
+                    key = row[position]
+                    for table in (pane[name], self.totals[name], self.pending[name]):
+                        totals = table.get(key)
+                        if totals is None:
+                            table[key] = [revenue, quantity, 1]
+                        else:
+                            totals[0] += revenue
+                            totals[1] += quantity
+                            totals[2] += 1
+            self.rows += len(rows)
+
+    def add_timed_rows(self, timed_rows: List[Tuple[float, Tuple]]):
+        """Account (emitted at, row) pairs whose DW load was confirmed later (bulk sink)"""
+        for pane_index, group in itertools.groupby(timed_rows, key=lambda item: self.pane_of(item[0])):
+            self.add_rows([row for _, row in group], pane_index * self.pane_seconds)
+
+    def committed(self):
+        """The rows added so far are now committed to the DW"""
+        with self.lock:
+            self.pending = {name: {} for name in self.dimensions}
+
+    def run_totals(self, dimension: str) -> Tuple[Totals, Totals]:
+        """(committed, uncommitted) totals per key of every row emitted in this run"""
+        if dimension not in self.dimensions:
+            raise KeyError(f"unknown dimension {dimension!r} (one of {', '.join(self.dimensions)})")
+        with self.lock:
+            pending = {key: list(values) for key, values in self.pending[dimension].items()}
+            committed = {}
+            for key, (revenue, quantity, count) in self.totals[dimension].items():
+                open_values = pending.get(key, (0.0, 0, 0))
+                if count > open_values[2]:
+                    committed[key] = [revenue - open_values[0], quantity - open_values[1], count - open_values[2]]
+        return committed, pending
+
+    def _expire(self, current_pane: int):
+        oldest = current_pane - self.retention_panes
+        for pane_index in [p for p in self.panes if p <= oldest]:
+            del self.panes[pane_index]
+
+    # =====================================================
+    # QUERIES
+    # =====================================================
+
+    def _sum(self, dimension: str, first_pane: int, last_pane: int) -> Totals:
+        if dimension not in self.dimensions:
+            raise KeyError(f"unknown dimension {dimension!r} (one of {', '.join(self.dimensions)})")
+        result: Totals = {}
+        with self.lock:
+            for pane_index, pane in self.panes.items():
+                if first_pane <= pane_index <= last_pane:
+                    _merge(result, pane[dimension])
+        return result
+
+    def tumbling(self, dimension: str, size: int, window_start: Optional[float] = None,
+                 now: Optional[float] = None) -> Dict[str, Tuple[float, int, int]]:
+        """
+        {key: (revenue, quantity, transactions)} of one tumbling window:
+        the window containing window_start, by default the one in progress
+        """
+        if size % self.pane_seconds:
+            raise ValueError(f"window of {size}s is not a multiple of the {self.pane_seconds}s pane")
+        at = (time.time() if now is None else now) if window_start is None else window_start
+        first = int(at // size) * size // self.pane_seconds
+        return {key: tuple(totals) for key, totals in
+                self._sum(dimension, first, first + size // self.pane_seconds - 1).items()}
+
+    def sliding(self, dimension: str, size: int, now: Optional[float] = None) -> Dict[str, Tuple[float, int, int]]:
+        """{key: (revenue, quantity, transactions)} over the last 'size' seconds (pane granularity)"""
+        if size % self.pane_seconds:
+            raise ValueError(f"window of {size}s is not a multiple of the {self.pane_seconds}s pane")
+        last = self.pane_of(time.time() if now is None else now)
+        return {key: tuple(totals) for key, totals in
+                self._sum(dimension, last - size // self.pane_seconds + 1, last).items()}
+
+    def top(self, dimension: str, size: int, n: int = 10, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """The n keys with the highest revenue over the last 'size' seconds"""
+        totals = self.sliding(dimension, size, now)
+        return sorted(((key, values[0]) for key, values in totals.items()), key=lambda item: -item[1])[:n]
+
+    # =====================================================
+    # SUMMARY TABLE
+    # =====================================================
+
+    def flush_due(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) - self.last_flush >= AGG_FLUSH_INTERVAL
+
+    def summary_rows(self, now: Optional[float] = None) -> List[Tuple]:
+        """
+        DW_WINDOW_AGGREGATES rows to write: tumbling windows that closed since
+        the last flush, and every sliding window as of now
+        """
+        now = time.time() if now is None else now
+        current = self.pane_of(now)
+        rows = []
+        for size in self.tumbling_sizes:
+            panes = size // self.pane_seconds
+            closed_end = current // panes * panes   # First pane of the window in progress
+            start = self.flushed_until[size]
+            if start is None:
+                with self.lock:
+                    start = min(self.panes, default=closed_end) // panes * panes
+            for first in range(start, closed_end, panes):
+                rows += self._window_rows('tumbling', size, first, first + panes - 1)
+            self.flushed_until[size] = closed_end
+        for size in self.sliding_sizes:
+            rows += self._window_rows('sliding', size, current - size // self.pane_seconds + 1, current)
+        self.last_flush = now
+        self.flushes += 1
+        return rows
+
+    def _window_rows(self, kind: str, size: int, first_pane: int, last_pane: int) -> List[Tuple]:
+        window_start = _timestamp(first_pane * self.pane_seconds)
+        window_end = _timestamp((last_pane + 1) * self.pane_seconds)
+        rows = []
+        for dimension in self.dimensions:
+            for key, (revenue, quantity, count) in self._sum(dimension, first_pane, last_pane).items():
+                rows.append((kind, size, window_start, window_end, dimension, str(key),
+                             round(revenue, 2), quantity, count))
+        return rows
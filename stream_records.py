@@ -0,0 +1,128 @@
+"""
+Stream Record Format
+====================
+Fixed-layout binary encoding of transaction stream tuples.
+
+Every record is RECORD_SIZE (22) bytes, little-endian, no padding:
+
+    order_id     int64
+    customer_id  uint32
+    product_id   uint32   digits of "P<digits>" in the low 27 bits,
+                          number of digits in the top bits (keeps zero padding)
+    quantity     uint16
+    date         uint32   proleptic Gregorian ordinal (date.toordinal())
+
+Batches are plain concatenations of records. Encoding and decoding work on
+whole columns with NumPy; decode_batch() is a zero-copy view of the buffer,
+so no Python object is created per field until tuples are materialized.
+
+Author: Shahzeb
+Course: DS3003 & DS3004 - Data Warehousing & Business Intelligence
+"""
+
+from datetime import date
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([
+    ('order_id', '<i8'),
+    ('customer_id', '<u4'),
+    ('product_id', '<u4'),
+    ('quantity', '<u2'),
+    ('date', '<u4')
+])
+RECORD_SIZE = RECORD_DTYPE.itemsize
+
+PRODUCT_PREFIX = 'P'
+PRODUCT_WIDTH_SHIFT = 27                      # 8 digits (< 2**27) fit below the width bits
+PRODUCT_VALUE_MASK = (1 << PRODUCT_WIDTH_SHIFT) - 1
+MAX_PRODUCT_DIGITS = 8
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # datetime64[D] counts days from here
+
+
+def _check_range(name: str, values: np.ndarray, dtype: str):
+    limits = np.iinfo(dtype)
+    if len(values) and (values.min() < limits.min or values.max() > limits.max):
+        raise ValueError(f"{name} out of range for {dtype}")
+
+
+def _int_column(name: str, values: Sequence, dtype=np.int64) -> np.ndarray:
+    """Column as an array (ValueError instead of NumPy's OverflowError/TypeError)"""
+    try:
+        return np.asarray(values, dtype=dtype)
+    except (OverflowError, TypeError) as e:
+        raise ValueError(f"{name} cannot be encoded: {e}") from e
+
+
+def encode_product_ids(product_ids: Sequence[str]) -> np.ndarray:
+    """Encode "P<1-8 digits>" product IDs (ValueError for anything else)"""
+    ids = np.asarray(product_ids, dtype=str)
+    digits = np.char.lstrip(ids, PRODUCT_PREFIX)
+    widths = np.char.str_len(digits)
+    valid = (np.char.startswith(ids, PRODUCT_PREFIX) & (np.char.str_len(ids) == widths + 1) &
+             np.char.isdigit(digits) & (widths <= MAX_PRODUCT_DIGITS))
+    if not valid.all():
+        raise ValueError(f"product ID {str(ids[~valid][0])!r} cannot be encoded")
+    return (widths.astype(np.uint32) << PRODUCT_WIDTH_SHIFT) | digits.astype(np.uint32)
+
+
+def decode_product_ids(codes: np.ndarray) -> np.ndarray:
+    """Inverse of encode_product_ids"""
+    widths = codes >> PRODUCT_WIDTH_SHIFT
+    values = (codes & PRODUCT_VALUE_MASK).astype(str)
+    result = np.empty(len(codes), dtype=f'<U{MAX_PRODUCT_DIGITS + 1}')
+    for width in np.unique(widths):
+        mask = widths == width
+        result[mask] = np.char.add(PRODUCT_PREFIX, np.char.zfill(values[mask], int(width)))
+    return result
+
+
+def encode_columns(order_ids: Sequence[int], customer_ids: Sequence[int], product_ids: Sequence[str],
+                   quantities: Sequence[int], dates: Sequence[str]) -> bytes:
+    """
+    Encode column sequences (dates as 'YYYY-MM-DD') into a record batch.
+    Raises ValueError for any value the record layout cannot hold.
+    """
+    lengths = {len(order_ids), len(customer_ids), len(product_ids), len(quantities), len(dates)}
+    if len(lengths) > 1:
+        raise ValueError(f"columns have different lengths {sorted(lengths)}")
+    records = np.empty(len(order_ids), dtype=RECORD_DTYPE)
+    columns = {
+        'order_id': _int_column('order_id', order_ids),
+        'customer_id': _int_column('customer_id', customer_ids),
+        'quantity': _int_column('quantity', quantities),
+        'date': _int_column('date', dates, 'datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+    }
+    for name, values in columns.items():
+        _check_range(name, values, RECORD_DTYPE[name].str)
+        records[name] = values
+    records['product_id'] = encode_product_ids(product_ids)
+    return records.tobytes()
+
+
+def encode_batch(tuples: List[Dict]) -> bytes:
+    """Encode stream tuple dicts into a record batch"""
+    return encode_columns([t['order_id'] for t in tuples],
+                          [t['customer_id'] for t in tuples],
+                          [t['product_id'] for t in tuples],
+                          [t['quantity'] for t in tuples],
+                          [t['order_date'] for t in tuples])
+
+
+def decode_batch(buffer) -> np.ndarray:
+    """Zero-copy structured array view of a record batch"""
+    if len(buffer) % RECORD_SIZE:
+        raise ValueError(f"record batch of {len(buffer)} bytes is not a multiple of {RECORD_SIZE}")
+    return np.frombuffer(buffer, dtype=RECORD_DTYPE)
+
+
+def records_to_tuples(records: np.ndarray) -> List[Dict]:
+    """Materialize decoded records as stream tuple dicts"""
+    dates = (records['date'].astype(np.int64) - EPOCH_ORDINAL).astype('datetime64[D]').astype(str)
+    columns = zip(records['order_id'].tolist(), records['customer_id'].tolist(),
+                  decode_product_ids(records['product_id']).tolist(),
+                  records['quantity'].tolist(), dates.tolist())
+    return [{'order_id': order_id, 'customer_id': customer_id, 'product_id': product_id,
+             'quantity': quantity, 'order_date': order_date}
+            for order_id, customer_id, product_id, quantity, order_date in columns]
@@ -0,0 +1,305 @@
+"""
+HYBRIDJOIN Component Tests
+==========================
+CommitPolicy, HashTable and checkpoint save/resume. Pure Python: no MySQL
+server is contacted (master data comes from the CSV files in data/).
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import hybrid_join
+from hybrid_join import CHECKPOINT_VERSION, HASH_TABLE_MIN_BUCKETS, CheckpointManager, CommitPolicy, HashTable, \
+    HybridJoin, MasterDataManager, QueueNode
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+CUSTOMER_FILE = os.path.join(DATA_DIR, 'customer_master_data.csv')
+PRODUCT_FILE = os.path.join(DATA_DIR, 'product_master_data.csv')
+
+
+class CommitPolicyTest(unittest.TestCase):
+
+    def make_policy(self, **kwargs):
+        options = dict(max_rows=1000, min_rows=100, max_bytes=10000, max_age=60.0, target_latency=0.05)
+        options.update(kwargs)
+        return CommitPolicy(**options)
+
+    def test_nothing_due_without_rows(self):
+        policy = self.make_policy(max_age=0.0)
+        self.assertIsNone(policy.due())
+        policy.record(0, 500)
+        self.assertIsNone(policy.due())
+
+    def test_triggers(self):
+        policy = self.make_policy()
+        policy.record(999, 100)
+        self.assertIsNone(policy.due())
+        policy.record(1, 100)
+        self.assertEqual(policy.due(), 'rows')
+
+        policy = self.make_policy()
+        policy.record(10, 10000)
+        self.assertEqual(policy.due(), 'bytes')
+
+        policy = self.make_policy()
+        policy.record(10, 100)
+        policy.opened_at = time.time() - 61
+        self.assertEqual(policy.due(), 'age')
+
+    def test_slow_commits_halve_row_target_down_to_min_rows(self):
+        policy = self.make_policy()
+        for expected in (500, 250, 125, 100, 100):
+            policy.record(policy.row_target, 0)
+            policy.committed(1.0, 'rows')
+            self.assertEqual(policy.row_target, expected)
+
+    def test_fast_full_commits_grow_row_target_up_to_max_rows(self):
+        policy = self.make_policy(max_rows=1000)
+        policy.row_target = 400
+        for expected in (500, 625, 781, 976, 1000, 1000):
+            policy.record(policy.row_target, 0)
+            policy.committed(0.001, 'rows')
+            self.assertEqual(policy.row_target, expected)
+
+    def test_fast_small_commits_keep_row_target(self):
+        policy = self.make_policy()
+        policy.row_target = 400
+        policy.record(10, 0)
+        policy.committed(0.001, 'age')
+        self.assertEqual(policy.row_target, 400)
+
+    def test_committed_resets_open_transaction(self):
+        policy = self.make_policy()
+        policy.record(10, 100)
+        policy.committed(0.01, 'age')
+        self.assertEqual((policy.pending_rows, policy.pending_bytes, policy.opened_at), (0, 0, None))
+        self.assertIsNone(policy.due())
+
+    def test_empty_commit_not_recorded(self):
+        policy = self.make_policy()
+        policy.committed(5.0, 'final')
+        self.assertEqual(policy.commits, 0)
+        self.assertEqual(policy.row_target, 1000)
+
+    def test_history_bounded_totals_not(self):
+        policy = self.make_policy(history=3)
+        for rows in (10, 20, 30, 40, 50):
+            policy.record(rows, 0)
+            policy.committed(rows / 1000, 'age')
+        self.assertEqual(list(policy.rows_per_commit), [30, 40, 50])
+        self.assertEqual(len(policy.commit_times), 3)
+        self.assertEqual(policy.commits, 5)
+        self.assertAlmostEqual(policy.commit_seconds, 0.15)
+        self.assertEqual(policy.max_commit_rows, 50)
+        self.assertEqual(dict(policy.reasons), {'age': 5})
+
+    def test_segment_mode(self):
+        policy = self.make_policy()
+        policy.segment_rows = 5000
+        policy.record(4999, 10 ** 6)
+        self.assertIsNone(policy.due())
+        policy.record(1, 0)
+        self.assertEqual(policy.due(), 'segment')
+        policy.committed(1.0, 'segment')
+        self.assertEqual(policy.row_target, 1000)
+
+        policy.record(1, 0)
+        policy.opened_at = time.time() - 61
+        self.assertEqual(policy.due(), 'age')
+
+    def test_percentiles(self):
+        self.assertEqual(CommitPolicy.percentiles([]), (0.0, 0.0, 0.0))
+        self.assertEqual(CommitPolicy.percentiles([3.0]), (3.0, 3.0, 3.0))
+        self.assertEqual(CommitPolicy.percentiles(range(1, 101)), (51, 96, 100))
+
+
+class HashTableTest(unittest.TestCase):
+
+    @staticmethod
+    def entry(key):
+        data = {'customer_id': key, 'order_id': key}
+        return key, data, QueueNode(key, data)
+
+    def test_fixed_table_stops_at_capacity(self):
+        table = HashTable(num_slots=4)
+        for key in range(4):
+            self.assertTrue(table.insert(*self.entry(key)))
+        self.assertEqual(table.available_slots(), 0)
+        self.assertFalse(table.insert(*self.entry(4)))
+        self.assertEqual(table.total_entries, 4)
+        self.assertEqual(table.resizes, 0)
+
+    def test_duplicate_keys_removed_by_queue_node(self):
+        table = HashTable(num_slots=10)
+        first, second = self.entry(7), self.entry(7)
+        table.insert(*first)
+        table.insert(*second)
+        self.assertEqual([node for _, node in table.lookup(7)], [first[2], second[2]])
+        self.assertTrue(table.remove(7, first[2]))
+        self.assertFalse(table.remove(7, first[2]))
+        self.assertEqual([node for _, node in table.lookup(7)], [second[2]])
+        self.assertEqual(table.lookup(8), [])
+
+    def test_budget_table_grows_and_shrinks(self):
+        table = HashTable(memory_budget=10 ** 9)
+        self.assertEqual(table.num_slots, HASH_TABLE_MIN_BUCKETS)
+        entries = [self.entry(key) for key in range(HASH_TABLE_MIN_BUCKETS * 4)]
+        for entry in entries:
+            self.assertTrue(table.insert(*entry))
+        self.assertGreater(table.num_slots, HASH_TABLE_MIN_BUCKETS)
+        self.assertLessEqual(table.total_entries / table.num_slots, table.load_factor)
+        for key, data, node in entries:
+            self.assertEqual(table.lookup(key), [(data, node)])
+
+        for key, _, node in entries:
+            self.assertTrue(table.remove(key, node))
+        self.assertEqual(table.num_slots, HASH_TABLE_MIN_BUCKETS)
+        self.assertEqual(table.total_entries, 0)
+        self.assertEqual(table.entry_bytes, 0)
+        self.assertEqual(table.memory_used(), table.bucket_bytes())
+
+    def test_budget_limits_admission(self):
+        key, data, node = self.entry(1)
+        budget = HASH_TABLE_MIN_BUCKETS * hybrid_join.HASH_BUCKET_BYTES + 10 * HashTable.entry_size(data)
+        table = HashTable(memory_budget=budget)
+        table.insert(key, data, node)
+        self.assertEqual(table.available_slots(), 9)
+        self.assertEqual(HashTable(memory_budget=HASH_TABLE_MIN_BUCKETS).available_slots(), 0)
+
+
+class CheckpointManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'checkpoint.json')
+        self.checkpoint = CheckpointManager(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_load_clear(self):
+        self.assertIsNone(self.checkpoint.load())
+        self.checkpoint.save({'producer_offset': 42, 'in_flight': [{'order_id': 1}]})
+        self.assertEqual(os.listdir(self.directory), ['checkpoint.json'])
+        state = self.checkpoint.load()
+        self.assertEqual(state['producer_offset'], 42)
+        self.assertEqual(state['in_flight'], [{'order_id': 1}])
+        self.assertEqual(state['version'], CHECKPOINT_VERSION)
+        self.checkpoint.clear()
+        self.assertFalse(self.checkpoint.exists())
+        self.checkpoint.clear()
+
+    def test_unreadable_checkpoint_ignored(self):
+        with open(self.path, 'w') as f:
+            f.write('{"producer_offset": 4')
+        self.assertIsNone(self.checkpoint.load())
+
+    def test_other_version_ignored(self):
+        with open(self.path, 'w') as f:
+            json.dump({'version': CHECKPOINT_VERSION - 1, 'producer_offset': 0}, f)
+        self.assertIsNone(self.checkpoint.load())
+
+
+class CheckpointResumeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.master_data = MasterDataManager(CUSTOMER_FILE, PRODUCT_FILE)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'checkpoint.json')
+        self.stream_file = os.path.join(self.directory, 'transactions.csv')
+        with open(self.stream_file, 'w') as f:
+            f.write('orderID,Customer_ID,Product_ID,quantity,date\n' + '1,1000001,P00069042,2,2017-01-01\n' * 50)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_join(self, source=None):
+        join = HybridJoin({}, self.master_data, checkpoint_path=self.path)
+        join.source = join.describe_source(source or self.stream_file)
+        return join
+
+    def in_flight(self, product_id='P00069042'):
+        customer_ids = self.master_data.current_version().sorted_customer_ids[:3]
+        return [{'order_id': i, 'customer_id': customer_id, 'product_id': product_id,
+                 'quantity': i + 1, 'order_date': '2017-01-0%d' % (i + 1)}
+                for i, customer_id in enumerate(customer_ids)]
+
+    def save(self, join, in_flight, offset=100):
+        master = self.master_data.current_version()
+        for tuple_data in in_flight:
+            join.admit_tuple(dict(tuple_data), master)
+        join.admitted_offset = offset
+        join.admitted_count = 10
+        join.commit_seq = 4
+        join.stats['tuples_joined'] = join.stats['tuples_loaded_to_dw'] = 7
+        join.save_checkpoint()
+
+    def test_round_trip(self):
+        in_flight = self.in_flight()
+        self.save(self.make_join(), in_flight)
+        self.assertIn('in_flight_records', CheckpointManager(self.path).load())
+
+        resumed = self.make_join()
+        self.assertTrue(resumed.resume_from_checkpoint())
+        self.assertEqual(resumed.queue.snapshot(), in_flight)
+        self.assertEqual(resumed.hash_table.total_entries, len(in_flight))
+        self.assertEqual((resumed.start_offset, resumed.admitted_offset), (100, 100))
+        self.assertEqual((resumed.admitted_count, resumed.commit_seq), (10, 4))
+        self.assertEqual(resumed.stats['tuples_loaded_to_dw'], 7)
+        self.assertEqual(resumed.stats['resumed_tuples_skipped'], 10)
+
+    def test_unencodable_tuples_saved_as_json(self):
+        in_flight = self.in_flight(product_id='SKU-1')
+        self.save(self.make_join(), in_flight)
+        self.assertIn('in_flight', CheckpointManager(self.path).load())
+
+        resumed = self.make_join()
+        self.assertTrue(resumed.resume_from_checkpoint())
+        self.assertEqual(resumed.queue.snapshot(), in_flight)
+
+    def test_empty_window(self):
+        self.save(self.make_join(), [])
+        resumed = self.make_join()
+        self.assertTrue(resumed.resume_from_checkpoint())
+        self.assertTrue(resumed.queue.is_empty())
+
+    def test_other_source_ignored(self):
+        self.save(self.make_join(), self.in_flight())
+        other_file = os.path.join(self.directory, 'other.csv')
+        shutil.copy(self.stream_file, other_file)
+        for source in (other_file, self.directory):
+            with self.subTest(source=source):
+                resumed = self.make_join(source)
+                self.assertFalse(resumed.resume_from_checkpoint())
+                self.assertTrue(resumed.queue.is_empty())
+                self.assertEqual(resumed.start_offset, 0)
+
+    def test_offset_past_end_of_file_ignored(self):
+        self.save(self.make_join(), self.in_flight(), offset=os.path.getsize(self.stream_file) + 1)
+        self.assertFalse(self.make_join().resume_from_checkpoint())
+
+    def test_producer_source_saves_no_offset(self):
+        join = HybridJoin({}, self.master_data, checkpoint_path=self.path)
+        join.source = join.describe_source(producer=self.stream_producer)
+        self.save(join, self.in_flight())
+        self.assertIsNone(CheckpointManager(self.path).load()['producer_offset'])
+
+        resumed = HybridJoin({}, self.master_data, checkpoint_path=self.path)
+        resumed.source = resumed.describe_source(producer=self.stream_producer)
+        self.assertTrue(resumed.resume_from_checkpoint())
+        self.assertEqual(resumed.start_offset, 0)
+        self.assertEqual(len(resumed.queue.snapshot()), 3)
+
+    def stream_producer(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
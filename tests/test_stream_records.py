@@ -0,0 +1,92 @@
+"""
+Stream Record Format Tests
+==========================
+Round trips and edge cases of the fixed-layout binary stream records.
+"""
+
+import unittest
+
+import numpy as np
+
+from stream_records import RECORD_SIZE, decode_batch, decode_product_ids, encode_batch, encode_columns, \
+    encode_product_ids, records_to_tuples
+
+
+def make_tuple(order_id=100000, customer_id=1000001, product_id='P00069042', quantity=2, order_date='2017-05-11'):
+    return {'order_id': order_id, 'customer_id': customer_id, 'product_id': product_id,
+            'quantity': quantity, 'order_date': order_date}
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def test_batch_round_trip(self):
+        tuples = [make_tuple(),
+                  make_tuple(order_id=1, customer_id=1006040, product_id='P00370853', quantity=1,
+                             order_date='2019-12-31'),
+                  make_tuple(order_id=2, product_id='P0', order_date='1970-01-01')]
+        buffer = encode_batch(tuples)
+        self.assertEqual(len(buffer), RECORD_SIZE * len(tuples))
+        self.assertEqual(records_to_tuples(decode_batch(buffer)), tuples)
+
+    def test_empty_batch(self):
+        buffer = encode_batch([])
+        self.assertEqual(buffer, b'')
+        self.assertEqual(records_to_tuples(decode_batch(buffer)), [])
+
+    def test_column_limits(self):
+        tuples = [make_tuple(order_id=2 ** 63 - 1, customer_id=2 ** 32 - 1, quantity=2 ** 16 - 1),
+                  make_tuple(order_id=-2 ** 63, customer_id=0, quantity=0, order_date='0001-01-01'),
+                  make_tuple(order_date='9999-12-31')]
+        self.assertEqual(records_to_tuples(decode_batch(encode_batch(tuples))), tuples)
+
+    def test_product_ids_keep_zero_padding(self):
+        product_ids = ['P0', 'P00', 'P007', 'P1', 'P00000000', 'P12345678', 'P99999999']
+        self.assertEqual(decode_product_ids(encode_product_ids(product_ids)).tolist(), product_ids)
+
+    def test_decode_is_a_view_of_the_buffer(self):
+        buffer = bytearray(encode_batch([make_tuple()]))
+        records = decode_batch(buffer)
+        buffer[:8] = (7).to_bytes(8, 'little')
+        self.assertEqual(int(records['order_id'][0]), 7)
+
+
+class EdgeCaseTest(unittest.TestCase):
+
+    def test_partial_record_rejected(self):
+        buffer = encode_batch([make_tuple(), make_tuple()])
+        with self.assertRaises(ValueError):
+            decode_batch(buffer[:-1])
+
+    def test_product_ids_outside_the_layout_rejected(self):
+        for product_id in ('X00069042', 'P', 'P123456789', 'P12a', 'PP1', 'P-1', ''):
+            with self.subTest(product_id=product_id), self.assertRaises(ValueError):
+                encode_batch([make_tuple(product_id=product_id)])
+
+    def test_out_of_range_values_rejected(self):
+        cases = {
+            'customer_id': (-1, 2 ** 32),
+            'quantity': (-1, 2 ** 16),
+            'order_id': (2 ** 63, 2 ** 64)
+        }
+        for field, values in cases.items():
+            for value in values:
+                with self.subTest(field=field, value=value), self.assertRaises(ValueError):
+                    encode_batch([make_tuple(**{field: value})])
+
+    def test_non_numeric_values_rejected(self):
+        for field, value in (('quantity', None), ('customer_id', 'abc'), ('order_date', '2017-13-01')):
+            with self.subTest(field=field, value=value), self.assertRaises(ValueError):
+                encode_batch([make_tuple(**{field: value})])
+
+    def test_columns_of_different_lengths_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_columns([1, 2], [1000001], ['P1'], [1], ['2017-01-01'])
+
+    def test_decoded_columns_are_numpy(self):
+        records = decode_batch(encode_batch([make_tuple()]))
+        self.assertIsInstance(records, np.ndarray)
+        self.assertEqual(records.dtype.itemsize, RECORD_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()